@@ -0,0 +1,53 @@
+import argparse
+import numpy as np
+import os
+import time
+
+os.environ["CUDA_VISIBLE_DEVICES"] = ""  # latency is measured on CPU, must be set before TensorFlow is loaded
+
+from keras import backend as K
+
+from Shared.ModelCreator import ModelCreator
+
+
+def measure(architecture, head, head_width, size, batch_size, runs):
+    model = ModelCreator(image_width=size, image_height=size).get_model(architecture, head=head,
+                                                                       head_width=head_width, base_weights=None)
+    head_params = sum(K.count_params(weights) for layer in model.layers[-4:] for weights in layer.weights)
+    images = np.random.rand(batch_size, size, size, 3).astype(np.float32)
+
+    model.predict_on_batch(images)  # warm-up
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict_on_batch(images)
+        latencies.append(time.perf_counter() - start)
+
+    params = model.count_params()
+    K.clear_session()
+    return params, head_params, np.median(latencies) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameters count and CPU latency of backbone and head configurations")
+    parser.add_argument("--architectures", default=",".join(model_def[0] for model_def in ModelCreator.ARCHITECTURES))
+    parser.add_argument("--heads", default="flatten,avg")
+    parser.add_argument("--head_width", type=int, default=1024)
+    parser.add_argument("--size", type=int, default=299)
+    parser.add_argument("--batch_size", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    architectures = {model_def[0]: model_def for model_def in ModelCreator.ARCHITECTURES}
+
+    print("{:<18}{:>9}{:>14}{:>14}{:>14}".format("architecture", "head", "params_m", "head_params_m", "latency_ms"))
+    for name in args.architectures.split(","):
+        for head in args.heads.split(","):
+            params, head_params, latency = measure(architectures[name], head, args.head_width, args.size,
+                                                   args.batch_size, args.runs)
+            print("{:<18}{:>9}{:>14.2f}{:>14.2f}{:>14.2f}".format(name, head, params / 1e6, head_params / 1e6,
+                                                                  latency))
+
+
+if __name__ == "__main__":
+    main()
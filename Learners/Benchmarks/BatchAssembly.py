@@ -0,0 +1,89 @@
+import argparse
+import gc
+import multiprocessing
+import numpy as np
+import sys
+import time
+
+import Shared.Globals
+import Shared.RubikLoss
+from Shared.DataGeneratorBase import DataGeneratorBase
+
+
+class LegacyDataGenerator(DataGeneratorBase):
+    """ Batch assembly as it was before preallocated buffers: lists, float64 and forced GC. """
+
+    def __getitem__(self, idx):
+        gc.collect()
+
+        start_index = idx * self.batch_size % self.images_count
+        last_index = min(start_index + self.batch_size, self.images_count)
+
+        batch_images = []
+        batch_labels = []
+
+        for position in range(start_index, last_index):
+            image_file = self.images_files[self.order[position]]
+            image, label = self.load_item(image_file, self.get_sample_seed(position))
+
+            batch_images.append(image / 255.0)
+            batch_labels.append(label)
+
+        return np.array(batch_images), np.array(batch_labels)
+
+
+def get_peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024.0 / (1024.0 if sys.platform == "darwin" else 1.0)
+
+
+def run_mode(mode, args, results):
+    generator_class = LegacyDataGenerator if mode == "legacy" else DataGeneratorBase
+    output_dtype = {"legacy": np.float64, "float32": np.float32, "uint8": np.uint8}[mode]
+
+    generator = generator_class.init_from_folder(args.images_folder, args.labels_folder,
+                                                 batch_size=args.batch_size,
+                                                 target_width=args.size, target_height=args.size,
+                                                 label_flip_pairs=Shared.RubikLoss.get_horizontal_flip_pairs(),
+                                                 label_extra_normalization=Shared.RubikLoss.correct_label_orientation,
+                                                 seed=0, output_dtype=output_dtype,
+                                                 batch_buffers=args.batch_buffers)
+
+    generator[0]  # warm up
+    times = []
+    for i in range(args.batches):
+        start = time.perf_counter()
+        generator[i % len(generator)]
+        times.append(time.perf_counter() - start)
+
+    results[mode] = (np.mean(times) * 1000.0, np.percentile(times, 95) * 1000.0, get_peak_rss_mb())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-batch time and peak RSS of DataGenerator batch assembly")
+    parser.add_argument("--images_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik"))
+    parser.add_argument("--labels_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik/Bounds"))
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch_buffers", type=int, default=0)
+    parser.add_argument("--size", type=int, default=299)
+    args = parser.parse_args()
+
+    # Each mode runs in its own process, so peak RSS is not shared between them
+    results = multiprocessing.Manager().dict()
+    for mode in ["legacy", "float32", "uint8"]:
+        process = multiprocessing.Process(target=run_mode, args=(mode, args, results))
+        process.start()
+        process.join()
+
+    print("{:<10}{:>16}{:>16}{:>16}".format("mode", "batch ms", "batch p95 ms", "peak RSS MB"))
+    for mode, (mean_ms, p95_ms, rss_mb) in results.items():
+        print("{:<10}{:>16.1f}{:>16.1f}{:>16.1f}".format(mode, mean_ms, p95_ms, rss_mb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import numpy as np
+import random
+import time
+
+import Shared.Globals
+import Shared.RubikLoss
+from Shared.DataGeneratorBase import DataGeneratorBase
+
+
+def create_generator(args, fused_augmentation):
+    return DataGeneratorBase.init_from_folder(args.images_folder, args.labels_folder,
+                                              target_width=args.size, target_height=args.size,
+                                              label_flip_pairs=Shared.RubikLoss.get_horizontal_flip_pairs(),
+                                              label_extra_normalization=Shared.RubikLoss.correct_label_orientation,
+                                              seed=0, augment_data=not args.no_augmentation,
+                                              fused_augmentation=fused_augmentation)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fused single-warp augmentation with multi-step one: "
+                                                 "labels geometry for the same seeds and time per item")
+    parser.add_argument("--images_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik"))
+    parser.add_argument("--labels_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik/Bounds"))
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--size", type=int, default=299)
+    parser.add_argument("--tolerance", type=float, default=0.01, help="max allowed label difference in pixels")
+    parser.add_argument("--no_augmentation", action="store_true")
+    args = parser.parse_args()
+
+    steps_generator = create_generator(args, fused_augmentation=False)
+    fused_generator = create_generator(args, fused_augmentation=True)
+
+    samples = [(steps_generator.images_files[i % steps_generator.images_count], i) for i in range(args.samples)]
+    loaded = [steps_generator.loader.load_image_and_labels(image_file) for image_file, _ in samples]
+
+    times = {}
+    labels = {}
+    for name, generator in [("steps", steps_generator), ("fused", fused_generator)]:
+        start = time.perf_counter()
+        result = []
+        for (image, label), (_, seed) in zip(loaded, samples):
+            random.seed(seed)
+            _, item_label = generator.augment_item(image, label.copy())
+            result.append(item_label)
+        times[name] = (time.perf_counter() - start) / len(samples) * 1000.0
+        labels[name] = np.array(result)
+
+    difference = np.abs(labels["steps"] - labels["fused"]).max(axis=(1, 2))
+    mismatches = [samples[i][0] for i in np.nonzero(difference > args.tolerance)[0]]
+
+    print("ms per item: steps {:.2f}, fused {:.2f}".format(times["steps"], times["fused"]))
+    print("max label difference: {:.6f} px, mismatches above {} px: {}".format(difference.max(), args.tolerance,
+                                                                              len(mismatches)))
+    for image_file in mismatches:
+        print("  ", image_file)
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import json
+import numpy as np
+import os
+import subprocess
+import sys
+
+MODULES = ["Shared.Globals", "Shared.RubikLoss", "Shared.CubeMetrics", "Shared.DataLoader", "Shared.DataGeneratorBase",
+           "Shared.DataGenerator", "Shared.ModelCreator", "Shared.Visualizer", "Shared.FrozenGraphRuntime"]
+
+HEAVY_MODULES = ["keras", "tensorflow", "matplotlib"]
+
+# Runs in fresh interpreter, so nothing imported before is counted
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start
+print(json.dumps({{"seconds": duration, "loaded": [name for name in {heavy} if name in sys.modules]}}))
+"""
+
+
+def measure_import(module, environment):
+    script = IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.check_output([sys.executable, "-c", script], env=environment, stderr=subprocess.DEVNULL)
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time of Shared modules in fresh interpreter, "
+                                                 "and which heavy frameworks they load")
+    parser.add_argument("--modules", default=",".join(MODULES))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    learners_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join([learners_folder, os.path.join(learners_folder, "Shared")])
+
+    print("{:<28} {:>10} {:>10}  {}".format("module", "median_ms", "min_ms", "loaded"))
+    for module in args.modules.split(","):
+        try:
+            results = [measure_import(module, environment) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError:
+            print("{:<28} {:>10} {:>10}  {}".format(module, "-", "-", "import failed"))
+            continue
+        times = np.array([result["seconds"] for result in results]) * 1000.0
+        loaded = ",".join(results[-1]["loaded"]) or "-"
+        print("{:<28} {:>10.1f} {:>10.1f}  {}".format(module, np.median(times), times.min(), loaded))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import cv2
+import numpy as np
+import os
+import threading
+import time
+import urllib.request
+
+import Shared.Globals
+from Shared.FrozenGraphRuntime import FrozenGraphRuntime
+from Shared.KeypointServer import KeypointServer, MicroBatcher
+
+
+def load_encoded_images(images_folder, images_extension, count):
+    names = sorted(image_file for image_file in os.listdir(images_folder) if image_file.endswith(images_extension))
+    return [cv2.imencode(".jpg", cv2.imread(os.path.join(images_folder, image_file)))[1].tobytes()
+            for image_file in names[:count]]
+
+
+def run_client(url, images, requests_count, offset, latencies):
+    for i in range(requests_count):
+        request = urllib.request.Request(url, data=images[(offset + i) % len(images)],
+                                         headers={"Content-Type": "application/octet-stream"})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+
+
+def run_load(runtime, images, max_batch_size, max_latency_ms, clients, requests_per_client):
+    batcher = MicroBatcher(runtime, max_batch_size=max_batch_size, max_latency_ms=max_latency_ms)
+    server = KeypointServer(("127.0.0.1", 0), batcher)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    url = "http://127.0.0.1:{}/predict".format(server.server_address[1])
+
+    latencies = []
+    threads = [threading.Thread(target=run_client, args=(url, images, requests_per_client, i, latencies))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - start
+
+    server.shutdown()
+    server.server_close()
+    batcher.close()
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000.0
+    return len(latencies) / total_time, p50, p99, batcher.get_stats()["mean_batch_size"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput vs latency of keypoint server "
+                                                 "for different micro-batch sizes and deadlines")
+    parser.add_argument("model_file")
+    parser.add_argument("--images_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik"))
+    parser.add_argument("--images_extension", default=".png")
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--batch_sizes", default="1,4,8,16")
+    parser.add_argument("--latencies_ms", default="0,2,5,10")
+    parser.add_argument("--width", type=int, default=299)
+    parser.add_argument("--height", type=int, default=299)
+    args = parser.parse_args()
+
+    images = load_encoded_images(args.images_folder, args.images_extension, args.images)
+    batch_sizes = [int(value) for value in args.batch_sizes.split(",")]
+    max_latencies = [float(value) for value in args.latencies_ms.split(",")]
+
+    runtime = FrozenGraphRuntime(args.model_file, batch_size=max(batch_sizes),
+                                 image_width=args.width, image_height=args.height)
+
+    print("{:>10}{:>14}{:>14}{:>12}{:>12}{:>12}".format("batch", "deadline_ms", "requests/s", "p50_ms", "p99_ms",
+                                                        "mean_batch"))
+    for max_batch_size in batch_sizes:
+        for max_latency_ms in max_latencies:
+            throughput, p50, p99, mean_batch_size = run_load(runtime, images, max_batch_size, max_latency_ms,
+                                                             args.clients, args.requests)
+            print("{:>10}{:>14.1f}{:>14.1f}{:>12.2f}{:>12.2f}{:>12.2f}".format(
+                max_batch_size, max_latency_ms, throughput, p50, p99, mean_batch_size))
+
+    runtime.close()
+
+
+if __name__ == "__main__":
+    main()
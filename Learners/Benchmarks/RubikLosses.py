@@ -0,0 +1,128 @@
+import argparse
+import numpy as np
+import tensorflow as tf
+import time
+from keras import backend as K
+
+import Shared.RubikLoss
+
+
+# region legacy losses (per-column slices and per-edge expressions, as before tensorized version)
+
+class LegacyCubePoints(object):
+    def __init__(self, y):
+        self.points = [(y[:, i * 2], y[:, i * 2 + 1]) for i in range(7)]
+        self.edges = [self.calc_len(a, b) for a, b in Shared.RubikLoss.CUBE_EDGES]
+
+    def calc_len(self, point1, point2):
+        x1, y1 = self.points[point1]
+        x2, y2 = self.points[point2]
+        return K.sqrt(K.square(x1 - x2) + K.square(y1 - y2))
+
+
+def legacy_cube_loss(y_true, y_pred):
+    cube_true = LegacyCubePoints(y_true)
+    cube_pred = LegacyCubePoints(y_pred)
+
+    def calc_diff_square(point1, point2):
+        x1, y1 = point1
+        x2, y2 = point2
+        return K.square(x1 - x2) + K.square(y1 - y2)
+
+    l1 = calc_diff_square(cube_true.points[0], cube_pred.points[0])
+    for i in range(1, len(cube_true.points)):
+        l1 = l1 + calc_diff_square(cube_true.points[i], cube_pred.points[i])
+    l1 = K.sqrt(l1)
+
+    l2 = K.square(K.sqrt(cube_true.edges[0]) - K.sqrt(cube_pred.edges[0]))
+    for i in range(1, len(cube_true.edges)):
+        l2 = l2 + K.square(K.sqrt(cube_true.edges[i]) - K.sqrt(cube_pred.edges[i]))
+    l2 = K.sqrt(l2)
+
+    return K.reshape(l1 + l2, (-1, 1))
+
+
+def legacy_cube_loss2(y_true, y_pred):
+    cube_true = LegacyCubePoints(y_true)
+    cube_pred = LegacyCubePoints(y_pred)
+
+    def calc_diff_relative(point_index, edge_indexes):
+        total_edge = cube_true.edges[edge_indexes[0]]
+        for ei in range(1, len(edge_indexes)):
+            total_edge = total_edge + cube_true.edges[edge_indexes[ei]]
+
+        x1, y1 = cube_true.points[point_index]
+        x2, y2 = cube_pred.points[point_index]
+        point_diff = K.abs(x1 - x2) + K.abs(y1 - y2)
+
+        return point_diff * len(edge_indexes) / total_edge
+
+    l1 = calc_diff_relative(0, Shared.RubikLoss.POINT_EDGES[0])
+    for pi in range(1, len(Shared.RubikLoss.POINT_EDGES)):
+        l1 = l1 + calc_diff_relative(pi, Shared.RubikLoss.POINT_EDGES[pi])
+    l1 = K.sqrt(l1)
+
+    l2 = K.abs(cube_true.edges[0] - cube_pred.edges[0]) / cube_true.edges[0]
+    for i in range(1, len(cube_true.edges)):
+        l2 = l2 + K.abs(cube_true.edges[i] - cube_pred.edges[i]) / cube_true.edges[i]
+    l2 = K.sqrt(l2)
+
+    return K.reshape(l1 + l2, (-1, 1))
+
+
+def legacy_cube_loss3(y_true, y_pred):
+    return legacy_cube_loss(y_true, y_pred) + legacy_cube_loss2(y_true, y_pred) / 40
+
+# endregion
+
+
+def measure(loss_function, y_true_value, y_pred_value, steps):
+    graph = tf.get_default_graph()
+    y_true = K.placeholder(shape=(None, 14))
+    y_pred = K.placeholder(shape=(None, 14))
+
+    ops_before = len(graph.get_operations())
+    loss = loss_function(y_true, y_pred)
+    forward_ops = len(graph.get_operations()) - ops_before
+    gradient = K.gradients(K.mean(loss), [y_pred])[0]
+    total_ops = len(graph.get_operations()) - ops_before
+
+    step = K.function([y_true, y_pred], [loss, gradient])
+    value = step([y_true_value, y_pred_value])[0]  # warm up
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        step([y_true_value, y_pred_value])
+    step_ms = (time.perf_counter() - start) / steps * 1000.0
+
+    return forward_ops, total_ops, step_ms, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph size and step time of Rubik cube losses, legacy vs tensorized")
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    random = np.random.RandomState(0)
+    y_true_value = random.uniform(0.2, 0.8, (args.batch_size, 14)).astype(np.float32)
+    y_pred_value = (y_true_value + random.normal(0.0, 0.05, y_true_value.shape)).astype(np.float32)
+
+    print("{:<12}{:>12}{:>12}{:>12}{:>12}{:>12}{:>14}".format(
+        "loss", "ops before", "ops after", "all before", "all after", "ms before", "ms after"))
+    for name, legacy_function, function in [("cube_loss", legacy_cube_loss, Shared.RubikLoss.cube_loss),
+                                            ("cube_loss2", legacy_cube_loss2, Shared.RubikLoss.cube_loss2),
+                                            ("cube_loss3", legacy_cube_loss3, Shared.RubikLoss.cube_loss3)]:
+        legacy_ops, legacy_total_ops, legacy_ms, legacy_value = measure(legacy_function, y_true_value,
+                                                                        y_pred_value, args.steps)
+        ops, total_ops, ms, value = measure(function, y_true_value, y_pred_value, args.steps)
+
+        max_difference = np.abs(legacy_value - value).max()
+        print("{:<12}{:>12}{:>12}{:>12}{:>12}{:>12.3f}{:>14.3f}   max difference {:.2e}".format(
+            name, legacy_ops, ops, legacy_total_ops, total_ops, legacy_ms, ms, max_difference))
+        if not np.allclose(legacy_value, value, rtol=1e-5, atol=1e-6):
+            raise SystemExit(name + " is not equivalent to legacy implementation")
+
+
+if __name__ == "__main__":
+    main()
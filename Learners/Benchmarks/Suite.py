@@ -0,0 +1,243 @@
+import argparse
+import json
+import numpy as np
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+import Shared.RubikLoss
+import Shared.SyntheticRubik
+from Shared.DataGeneratorBase import DataGeneratorBase
+from Shared.DataLoader import DataLoader
+
+STAGES = ["loader", "augment", "getitem", "cache_data", "losses", "train_step", "frozen_inference"]
+
+
+def summarize(times, items=1):
+    times = np.array(times) * 1000.0
+    return {"runs": len(times),
+            "median_ms": float(np.median(times)),
+            "min_ms": float(times.min()),
+            "max_ms": float(times.max()),
+            "per_item_ms": float(np.median(times) / items)}
+
+
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def create_generator(args, **kwargs):
+    return DataGeneratorBase.init_from_folder(args.data_folder, args.labels_folder, batch_size=args.batch_size,
+                                              target_width=args.size, target_height=args.size,
+                                              label_flip_pairs=Shared.RubikLoss.get_horizontal_flip_pairs(),
+                                              label_extra_normalization=Shared.RubikLoss.correct_label_orientation,
+                                              seed=0, **kwargs)
+
+
+# region stages
+
+def benchmark_loader(args):
+    loader = DataLoader(args.data_folder, args.labels_folder, ".png", ".bounds")
+    manifest_loader = DataLoader(args.data_folder, args.labels_folder, ".png", ".bounds", use_manifest=True)
+    manifest_loader.get_image_file_names()  # builds manifest, later runs only revalidate it
+    names = loader.get_image_file_names()
+
+    return {"listing": summarize(measure(loader.get_image_file_names, args.repeat)),
+            "listing_manifest": summarize(measure(manifest_loader.get_image_file_names, args.repeat)),
+            "load_image_and_labels": summarize(measure(lambda: [loader.load_image_and_labels(name)
+                                                                for name in names], args.repeat), len(names))}
+
+
+def benchmark_augment(args):
+    generator = create_generator(args)
+    loaded = [generator.loader.load_image_and_labels(name) for name in generator.images_files]
+    steps = ["flip_image_lr", "random_rotate", "random_scale", "random_crop", "normalize_label"]
+    times = {step: [] for step in steps + ["augment_item", "augment_item_fused"]}
+
+    def timed(step, function, *function_args):
+        start = time.perf_counter()
+        result = function(*function_args)
+        times[step].append(time.perf_counter() - start)
+        return result
+
+    random.seed(0)
+    for _ in range(args.repeat):
+        for image, label in loaded:
+            item_image, item_label = timed("flip_image_lr", generator.flip_image_lr, image, label.copy())
+            item_image, item_label = timed("random_rotate", generator.random_rotate, item_image, item_label)
+            item_image, item_label = timed("random_scale", generator.random_scale, item_image, item_label,
+                                           image.shape[0], image.shape[1])
+            item_image, item_label = timed("random_crop", generator.random_crop, item_image, item_label)
+            timed("normalize_label", generator.normalize_label, item_label)
+
+            timed("augment_item", generator.augment_item, image, label.copy())
+            generator.fused_augmentation = True
+            timed("augment_item_fused", generator.augment_item, image, label.copy())
+            generator.fused_augmentation = False
+
+    return {step: summarize(step_times) for step, step_times in times.items()}
+
+
+def benchmark_getitem(args):
+    results = {}
+    for workers in sorted({0, args.workers}):
+        generator = create_generator(args, workers=workers)
+        generator[0]  # starts workers
+        results["workers_{}".format(workers)] = summarize(
+            measure(lambda: [generator[idx] for idx in range(len(generator))], args.repeat),
+            len(generator) * args.batch_size)
+        generator.close()
+    return results
+
+
+def benchmark_cache_data(args):
+    times = []
+    for _ in range(args.repeat):
+        generator = create_generator(args, augment_data=False)
+        start = time.perf_counter()
+        generator.cache_data()
+        times.append(time.perf_counter() - start)
+        cached_batches = summarize(measure(lambda: [generator[idx] for idx in range(len(generator))], 1),
+                                   len(generator))
+        generator.close()
+    return {"cache_data": summarize(times, generator.images_count), "cached_batches": cached_batches}
+
+
+def benchmark_losses(args):
+    from keras import backend as K
+
+    y_true = K.placeholder(shape=(None, 14))
+    y_pred = K.placeholder(shape=(None, 14))
+    labels = np.random.rand(args.batch_size, 14).astype(np.float32)
+    predictions = labels + np.random.normal(0, 0.02, labels.shape).astype(np.float32)
+
+    results = {}
+    for loss in [Shared.RubikLoss.cube_loss, Shared.RubikLoss.cube_loss2, Shared.RubikLoss.cube_loss3]:
+        function = K.function([y_true, y_pred], [loss(y_true, y_pred)])
+        function([labels, predictions])
+        results[loss.__name__] = summarize(measure(lambda: function([labels, predictions]), args.repeat * 10))
+    return results
+
+
+def benchmark_train_step(args):
+    from keras import backend as K
+    from Shared.ModelCreator import ModelCreator
+
+    architectures = {model_def[0]: model_def for model_def in ModelCreator.ARCHITECTURES}
+    generator = create_generator(args)
+    images, labels = generator[0]
+    generator.close()
+
+    results = {}
+    for name in args.architectures.split(","):
+        model_creator = ModelCreator(image_width=args.size, image_height=args.size)
+        model = model_creator.get_model(architectures[name], loss_function=Shared.RubikLoss.cube_loss3,
+                                        head=args.head, base_weights=None)
+        model_creator.unfreeze_top(model, from_level=0)
+        model.train_on_batch(images, labels)
+        results[name] = summarize(measure(lambda: model.train_on_batch(images, labels), args.repeat),
+                                  len(images))
+        results[name]["params"] = int(model.count_params())
+        K.clear_session()
+    return results
+
+
+def benchmark_frozen_inference(args):
+    from keras import backend as K
+    from Shared.FrozenGraphRuntime import FrozenGraphRuntime
+    from Shared.ModelCreator import ModelCreator
+
+    architecture = [model_def for model_def in ModelCreator.ARCHITECTURES
+                    if model_def[0] == args.inference_architecture][0]
+    model = ModelCreator(image_width=args.size, image_height=args.size).get_model(architecture, head=args.head,
+                                                                                 base_weights=None)
+    graph_file = os.path.join(tempfile.mkdtemp(), "benchmark.pb")
+    with open(graph_file, "wb") as f:
+        f.write(ModelCreator.freeze_inference_graph(model).SerializeToString())
+    K.clear_session()
+
+    loader = DataLoader(args.data_folder, args.labels_folder, ".png", ".bounds")
+    images = [loader.load_image_and_labels(name)[0] for name in loader.get_image_file_names()]
+
+    runtime = FrozenGraphRuntime(graph_file, batch_size=args.batch_size, image_width=args.size,
+                                 image_height=args.size)
+    times = measure(lambda: runtime.predict(images), args.repeat)
+    result = {"architecture": args.inference_architecture,
+              "graph_size_mb": os.path.getsize(graph_file) / 1024 ** 2,
+              "predict": summarize(times, len(images))}
+    result.update({key: float(value) for key, value in runtime.get_stats().items()})
+    runtime.close()
+    os.remove(graph_file)
+    return result
+
+# endregion
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time data pipeline and model stages on synthetic Rubik dataset, "
+                                                 "results are written as JSON")
+    parser.add_argument("--data_folder", default=os.path.join(tempfile.gettempdir(), "RubikSynthetic"))
+    parser.add_argument("--images", type=int, default=200, help="synthetic images to generate if folder is empty")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch_size", type=int, default=16)
+    parser.add_argument("--size", type=int, default=299)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--head", default="flatten")
+    parser.add_argument("--architectures", default="VGG16,ResNet50,InceptionV3,Xception,MobileNet_050,MobileNetV2_035")
+    parser.add_argument("--inference_architecture", default="MobileNetV2_035")
+    parser.add_argument("--output", default=None, help="JSON file, printed if not set")
+    args = parser.parse_args()
+
+    args.labels_folder = os.path.join(args.data_folder, "Bounds")
+    if not os.path.isdir(args.data_folder) or not any(name.endswith(".png") for name in os.listdir(args.data_folder)):
+        Shared.SyntheticRubik.generate_dataset(args.data_folder, args.labels_folder, args.images)
+
+    stages = {"loader": benchmark_loader,
+              "augment": benchmark_augment,
+              "getitem": benchmark_getitem,
+              "cache_data": benchmark_cache_data,
+              "losses": benchmark_losses,
+              "train_step": benchmark_train_step,
+              "frozen_inference": benchmark_frozen_inference}
+
+    results = {"commit": get_commit(),
+               "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "platform": platform.platform(),
+               "python": platform.python_version(),
+               "numpy": np.__version__,
+               "settings": {key: value for key, value in vars(args).items() if key != "output"},
+               "stages": {}}
+    for stage in args.stages.split(","):
+        print("benchmarking", stage, "...", flush=True)
+        try:
+            results["stages"][stage] = stages[stage](args)
+        except Exception as e:  # one failed stage (e.g. missing GPU memory) should not lose the others
+            results["stages"][stage] = {"error": "{}: {}".format(type(e).__name__, e)}
+
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
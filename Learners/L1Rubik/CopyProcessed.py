@@ -1,14 +1,16 @@
 import os
 import shutil
 import Shared.Globals
+from Shared.DataLoader import DataLoader
 
 data_dir = Shared.Globals.get_subdir("Rubik/Only Rubik")
 labels_dir = Shared.Globals.get_subdir("Rubik/Only Rubik/Bounds")
 processed_dir = Shared.Globals.get_subdir("Rubik/Only Rubik/Processed")
 
-for image_file in os.listdir(data_dir):
-    if image_file.endswith(".png"):
-        label_file = os.path.splitext(image_file)[0] + ".bounds"
-        if os.path.isfile(os.path.join(labels_dir, label_file)):
-            if not os.path.isfile(os.path.join(processed_dir, image_file)):
-                shutil.copy(os.path.join(data_dir, image_file), processed_dir)
+loader = DataLoader(data_dir, labels_dir, ".png", ".bounds", use_manifest=True)
+with os.scandir(processed_dir) as entries:
+    processed_files = set(entry.name for entry in entries)
+
+for image_file in loader.get_image_file_names():
+    if image_file not in processed_files:
+        shutil.copy(os.path.join(data_dir, image_file), processed_dir)
@@ -0,0 +1,84 @@
+import Shared.Globals
+import Shared.RubikLoss
+from Shared.DataGenerator import DataGenerator
+from Shared.Distillation import DistillationGenerator, cache_teacher_predictions, compare
+from Shared.ModelCreator import ModelCreator
+
+import keras
+import time
+from os import path
+
+train_data_dir = Shared.Globals.get_subdir("Rubik/Only Rubik")
+train_labels_dir = Shared.Globals.get_subdir("Rubik/Only Rubik/Bounds")
+models_dir = Shared.Globals.get_subdir("Rubik/Models/L1Rubik")
+checkpoints_dir = path.join(models_dir, "Checkpoints")
+store_file = Shared.Globals.get_subdir("Rubik/Only Rubik/Augmented.pack")  # made by MaterializeAugmentations.py
+
+teacher_file_name = path.join(models_dir, "1807281802-VGG16-SGD.h5")
+teacher_validation_file = path.splitext(teacher_file_name)[0] + "-validation.txt"  # written by TestLearner.py
+student_definition = ModelCreator.MobileNetV2_050
+student_head = "avg"
+student_head_width = 256
+teacher_weight = 0.5  # share of teacher predictions in loss, the rest is ground truth
+
+img_width, img_height = 299, 299
+nb_labels = 14
+batch_size = 32
+head_epochs = 10
+epochs = 100
+
+# teacher has seen all images except its validation ones, student is compared to it on exactly those
+if not path.isfile(teacher_validation_file):
+    raise ValueError("Validation images list of teacher is missing: " + teacher_validation_file +
+                     ", without it validation would overlap teacher training data")
+with open(teacher_validation_file) as f:
+    teacher_validation_files = [line.strip() for line in f if line.strip()]
+
+Shared.RubikLoss.register_losses()
+
+teacher = ModelCreator(image_width=img_width, image_height=img_height, nb_labels=nb_labels).load(teacher_file_name)
+predictions_file = path.splitext(store_file)[0] + "-" + path.splitext(path.basename(teacher_file_name))[0] + ".npy"
+if not path.isfile(predictions_file):
+    start = time.time()
+    count = cache_teacher_predictions(teacher, store_file, predictions_file, batch_size=batch_size)
+    print("cached teacher predictions for {} augmented images in {:.0f} s".format(count, time.time() - start))
+
+# not augmented generator only splits images and provides validation data
+data_generator = DataGenerator.init_from_folder(train_data_dir, train_labels_dir, batch_size=batch_size,
+                                                augment_data=False, target_width=img_width, target_height=img_height,
+                                                label_flip_pairs=Shared.RubikLoss.get_horizontal_flip_pairs(),
+                                                label_extra_normalization=Shared.RubikLoss.correct_label_orientation,
+                                                seed=0, use_manifest=True)
+validation_data = data_generator.get_validation_data(teacher_validation_files)
+validation_data.cache_data()
+train_data = DistillationGenerator(store_file, predictions_file, data_generator.images_files, batch_size=batch_size)
+
+student_creator = ModelCreator(image_width=img_width, image_height=img_height, nb_labels=nb_labels)
+student_creator.metrics = [Shared.RubikLoss.ground_truth_cube_loss3]
+student = student_creator.get_model(student_definition,
+                                    loss_function=Shared.RubikLoss.get_distillation_loss(teacher_weight),
+                                    head=student_head, head_width=student_head_width)
+
+time_stamp = time.strftime("%y%m%d%H%M") + "-" + student_creator.base_model_name + "-Distilled"
+checkpoint_file = path.join(checkpoints_dir, time_stamp + ".h5")
+
+
+def fit_student(override_epochs=-1):
+    tensor_board = keras.callbacks.TensorBoard(log_dir="./Logs/" + time_stamp, histogram_freq=0, write_graph=False)
+    reduce_lr = keras.callbacks.ReduceLROnPlateau(monitor="loss", factor=0.5, patience=10, cooldown=1, verbose=1)
+    checkpoint = keras.callbacks.ModelCheckpoint(filepath=checkpoint_file, monitor="loss", verbose=1,
+                                                 save_best_only=True, save_weights_only=True)
+    student.fit_generator(train_data, epochs=epochs if override_epochs < 1 else override_epochs,
+                          callbacks=[tensor_board, reduce_lr, checkpoint], workers=0)
+
+
+# validation data has ground truth targets only (no teacher part), so it is used after training by compare
+fit_student(override_epochs=head_epochs)
+student_creator.unfreeze_top(student, from_level=0, new_lr=0.0001)
+fit_student()
+
+student.load_weights(checkpoint_file)
+compare(teacher, student, validation_data)
+data_generator.close()
+
+ModelCreator.save_tf(student, checkpoints_dir, time_stamp + ".pb")
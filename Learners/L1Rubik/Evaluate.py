@@ -0,0 +1,101 @@
+import Shared.CubeMetrics
+import Shared.Globals
+import Shared.RubikLoss
+from Shared.DataGeneratorBase import DataGeneratorBase
+from Shared.PrefetchingGenerator import PrefetchingGenerator
+
+import argparse
+import csv
+import numpy as np
+import time
+
+
+def load_keras_predictor(model_file_name):
+    from Shared.ModelCreator import ModelCreator
+
+    Shared.RubikLoss.register_losses()
+    model = ModelCreator().load(model_file_name)
+    return model.predict_on_batch
+
+
+def load_frozen_graph_predictor(model_file_name, batch_size, width, height):
+    from Shared.FrozenGraphRuntime import FrozenGraphRuntime
+
+    runtime = FrozenGraphRuntime(model_file_name, batch_size=batch_size, image_width=width, image_height=height)
+    return runtime.predict_normalized
+
+
+def get_csv_header():
+    return ["file", "cube_loss", "cube_loss2", "cube_loss3", "mean_point_error_px", "max_point_error_px"] + \
+           ["point_{}_error_px".format(i) for i in range(7)] + \
+           ["edge_{}_error_px".format(i) for i in range(len(Shared.RubikLoss.CUBE_EDGES))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate saved model (.h5 or frozen .pb) on labeled folder")
+    parser.add_argument("model_file")
+    parser.add_argument("--images_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik"))
+    parser.add_argument("--labels_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik/Bounds"))
+    parser.add_argument("--output_csv", default="evaluation.csv")
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--prefetch_batches", type=int, default=4)
+    parser.add_argument("--width", type=int, default=299)
+    parser.add_argument("--height", type=int, default=299)
+    args = parser.parse_args()
+
+    if args.model_file.endswith(".pb"):
+        predict = load_frozen_graph_predictor(args.model_file, args.batch_size, args.width, args.height)
+    else:
+        predict = load_keras_predictor(args.model_file)
+
+    generator = DataGeneratorBase.init_from_folder(args.images_folder, args.labels_folder, batch_size=args.batch_size,
+                                                   augment_data=False, target_width=args.width,
+                                                   target_height=args.height,
+                                                   label_flip_pairs=Shared.RubikLoss.get_horizontal_flip_pairs(),
+                                                   label_extra_normalization=Shared.RubikLoss.correct_label_orientation,
+                                                   workers=args.workers, use_manifest=True)
+    batches_files = [generator.get_batch_files(idx) for idx in range(len(generator))]
+    scale = (args.width, args.height)
+
+    # Only per-sample summary values are kept for percentiles, everything else is streamed to CSV
+    summary = {"cube_loss": [], "cube_loss2": [], "cube_loss3": [], "mean_point_error_px": []}
+
+    start = time.time()
+    with open(args.output_csv, "w", newline="") as csv_file, \
+            PrefetchingGenerator(generator, queue_size=args.prefetch_batches) as batches:
+        writer = csv.writer(csv_file)
+        writer.writerow(get_csv_header())
+
+        for batch_files in batches_files:
+            images, labels = next(batches)
+            predictions = np.asarray(predict(images), dtype=np.float32)
+
+            losses = [Shared.CubeMetrics.cube_loss(labels, predictions),
+                      Shared.CubeMetrics.cube_loss2(labels, predictions),
+                      Shared.CubeMetrics.cube_loss3(labels, predictions)]
+            point_errors = Shared.CubeMetrics.point_errors(labels, predictions, scale)
+            edge_errors = Shared.CubeMetrics.edge_errors(labels, predictions, scale)
+            mean_point_errors = point_errors.mean(axis=-1)
+
+            for key, values in zip(["cube_loss", "cube_loss2", "cube_loss3", "mean_point_error_px"],
+                                   losses + [mean_point_errors]):
+                summary[key].append(values.astype(np.float32))
+
+            rows = np.column_stack(losses + [mean_point_errors, point_errors.max(axis=-1), point_errors, edge_errors])
+            for image_file, row in zip(batch_files, rows):
+                writer.writerow([image_file] + ["{:.6f}".format(value) for value in row])
+    generator.close()
+
+    samples = generator.images_count
+    print("evaluated {} images in {:.1f} s, per-sample results in {}".format(samples, time.time() - start,
+                                                                          args.output_csv))
+    print("{:<22}{:>10}{:>10}{:>10}{:>10}{:>10}".format("metric", "mean", "p50", "p90", "p95", "p99"))
+    for key, values in summary.items():
+        values = np.concatenate(values)
+        print("{:<22}{:>10.4f}{:>10.4f}{:>10.4f}{:>10.4f}{:>10.4f}".format(
+            key, values.mean(), *np.percentile(values, [50, 90, 95, 99])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import Shared.Globals
+import Shared.RubikLoss
+from Shared.AugmentationStore import materialize
+from Shared.DataGeneratorBase import DataGeneratorBase
+
+import os
+import time
+
+train_data_dir = Shared.Globals.get_subdir("Rubik/Only Rubik")
+train_labels_dir = Shared.Globals.get_subdir("Rubik/Only Rubik/Bounds")
+store_file = Shared.Globals.get_subdir("Rubik/Only Rubik/Augmented.pack")
+
+img_width, img_height = 299, 299
+variants = 8
+seed = 0
+workers = 4
+
+data_generator = DataGeneratorBase.init_from_folder(
+    train_data_dir, train_labels_dir, target_width=img_width, target_height=img_height,
+    label_flip_pairs=Shared.RubikLoss.get_horizontal_flip_pairs(),
+    label_extra_normalization=Shared.RubikLoss.correct_label_orientation, use_manifest=True)
+
+start = time.time()
+count = materialize(data_generator, store_file, variants, seed=seed, workers=workers)
+print("rendered {} augmented images in {:.0f} s into {} ({:.1f} MB)".format(
+    count, time.time() - start, store_file, os.path.getsize(store_file) / 1024.0 ** 2))
@@ -0,0 +1,110 @@
+import Shared.Globals
+import Shared.PackedDataset
+import Shared.RubikLoss
+import Shared.SweepRunner
+
+import argparse
+import json
+import numpy as np
+import os
+import tempfile
+import time
+
+# Swept keys override these, data_file and image_size are set by main for all runs
+DEFAULT_CONFIG = {"architecture": "MobileNetV2_050", "head": "avg", "head_width": 256, "batch_size": 32,
+                  "lr": 0.001, "epochs": 10, "unfreeze": "top", "seed": 0}
+
+DEFAULT_GRID = {"architecture": ["MobileNetV2_050", "MobileNet_050"], "lr": [0.001, 0.0001]}
+
+RESULT_KEYS = ["best_val_loss", "best_epoch", "seconds_per_epoch", "train_images_per_second", "params"]
+
+
+def train(config, threads):
+    """ Trains one config on packed dataset, returns best validation loss, epoch time and training throughput. """
+    from keras import backend as K
+    from keras.callbacks import LambdaCallback
+    import tensorflow as tf
+    from Shared.DataGenerator import DataGenerator
+    from Shared.ModelCreator import ModelCreator
+
+    K.set_session(tf.Session(config=tf.ConfigProto(intra_op_parallelism_threads=threads,
+                                                   inter_op_parallelism_threads=2)))
+    Shared.RubikLoss.register_losses()
+
+    image_size = config["image_size"]
+    data_generator = DataGenerator.init_from_folder(
+        config["data_file"], None, batch_size=config["batch_size"], target_width=image_size, target_height=image_size,
+        label_flip_pairs=Shared.RubikLoss.get_horizontal_flip_pairs(),
+        label_extra_normalization=Shared.RubikLoss.correct_label_orientation, seed=config["seed"])
+    validation_data = data_generator.get_validation_data()
+
+    architectures = {model_def[0]: model_def for model_def in ModelCreator.ARCHITECTURES}
+    model_creator = ModelCreator(image_width=image_size, image_height=image_size)
+    model = model_creator.get_model(architectures[config["architecture"]], loss_function=Shared.RubikLoss.cube_loss3,
+                                    head=config["head"], head_width=config["head_width"])
+    model_creator.unfreeze_top(model, from_level=0 if config["unfreeze"] == "all" else -1, new_lr=config["lr"])
+
+    # epoch time includes validation, training time ends with last training batch
+    marks = {"epoch_start": 0.0, "train_end": 0.0}
+    epoch_times = []
+    train_times = []
+    epoch_timer = LambdaCallback(
+        on_epoch_begin=lambda epoch, logs: marks.update(epoch_start=time.perf_counter()),
+        on_batch_end=lambda batch, logs: marks.update(train_end=time.perf_counter()),
+        on_epoch_end=lambda epoch, logs: (epoch_times.append(time.perf_counter() - marks["epoch_start"]),
+                                          train_times.append(marks["train_end"] - marks["epoch_start"])))
+
+    try:
+        history = model.fit_generator(data_generator, epochs=config["epochs"], validation_data=validation_data,
+                                      callbacks=[epoch_timer], workers=0)
+    finally:
+        data_generator.close()
+
+    val_losses = history.history["val_loss"]
+    return {"best_val_loss": float(min(val_losses)),
+            "best_epoch": int(np.argmin(val_losses)) + 1,
+            "seconds_per_epoch": float(np.median(epoch_times)),
+            "train_images_per_second": len(data_generator) * config["batch_size"] / float(np.median(train_times)),
+            "params": int(model.count_params())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train grid or list of configs in parallel pinned processes")
+    parser.add_argument("--grid", default=None,
+                        help="JSON file with dict of value lists (grid) or list of configs, default is small demo grid")
+    parser.add_argument("--parallel", type=int, default=2, help="concurrent runs, cores are split between them")
+    parser.add_argument("--images_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik"))
+    parser.add_argument("--labels_folder", default=Shared.Globals.get_subdir("Rubik/Only Rubik/Bounds"))
+    parser.add_argument("--data_file", default=os.path.join(tempfile.gettempdir(), "RubikSweep.pack"),
+                        help="packed dataset shared by all runs, made from images folder if missing")
+    parser.add_argument("--size", type=int, default=224)
+    parser.add_argument("--output", default=None, help="JSON file for results")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid is not None:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    configs = Shared.SweepRunner.expand_grid(grid) if isinstance(grid, dict) else grid
+    configs = [dict(DEFAULT_CONFIG, **config) for config in configs]
+    for config in configs:
+        config.update(data_file=args.data_file, image_size=args.size)
+
+    # decoded once, runs map the same read-only file and share its pages in OS cache
+    if not os.path.isfile(args.data_file):
+        working_size = int(args.size * 1.25 + 0.5)
+        count = Shared.PackedDataset.pack_folder(args.images_folder, args.labels_folder, args.data_file,
+                                                 working_size, working_size)
+        print("packed {} images into {}".format(count, args.data_file))
+
+    outcomes = Shared.SweepRunner.run_sweep(train, configs, parallel_runs=args.parallel)
+    Shared.SweepRunner.print_results(outcomes, RESULT_KEYS)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump([{"config": config, "result": result, "error": error, "seconds": seconds}
+                       for config, result, error, seconds in outcomes], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
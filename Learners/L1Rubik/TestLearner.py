@@ -1,10 +1,18 @@
 import Shared.Globals
 import Shared.RubikLoss
+import Shared.ExportGraphs
 import Shared.Visualizer
+from Shared.AsyncModelCheckpoint import AsyncModelCheckpoint
+from Shared.CheckpointWriter import CheckpointWriter
 from Shared.DataGenerator import DataGenerator
+from Shared.FeatureCache import FeatureGenerator, build_feature_cache
 from Shared.ModelCreator import ModelCreator
+from Shared.PrefetchingGenerator import PrefetchingGenerator
+from Shared.StageTimer import StageTimer
+from Shared.StageTimerCallback import StageTimerCallback
 
 import keras
+import os
 import time
 from os import path
 
@@ -12,26 +20,55 @@ train_data_dir = Shared.Globals.get_subdir("Rubik/Only Rubik")
 train_labels_dir = Shared.Globals.get_subdir("Rubik/Only Rubik/Bounds")
 models_dir = Shared.Globals.get_subdir("Rubik/Models/L1Rubik")
 checkpoints_dir = path.join(models_dir, "Checkpoints")
+use_data_manifest = True
+revalidate_data_manifest = True  # False skips checking folders for changes since manifest was saved
+packed_data_file = None  # file made by Shared/PackedDataset.py from train_data_dir, used instead of folders
+augmentation_store_file = None  # file made by MaterializeAugmentations.py
+fresh_augmentation_ratio = 0.25
+validation_cache_budget = 4 * 1024 ** 3  # larger validation cache is spilled to disk
+prefetch_batches = 8
+profile_pipeline = False  # stages durations and data wait ratio in TensorBoard
 
 img_width, img_height = 299, 299
 nb_labels = 14
 batch_size = 32
 epochs = 300
 samples_multiplier = 2
+data_workers = 4
+data_io_threads = 0  # concurrent file readers with readahead, used when data_workers = 0
+data_cache_bytes = 0  # decoded images cache size, e.g. 8 * 1024 ** 3, preloaded as workers only read it
 
 model_definition = ModelCreator.VGG16
+model_head = "flatten"  # or "avg" / "max" global pooling, much smaller on large backbones
+model_head_width = 1024
+cache_bottleneck_features = False  # train head of new model on backbone features computed once
+bottleneck_variants = 2 * samples_multiplier  # augmented variants of each image in features cache
+bottleneck_epochs = 20
 weights_file_name = path.join(models_dir, "1807281802-VGG16-SGD.h5")
 load_full_model = False
 
+checkpoints_to_keep = 3
 save_model = True
+export_inference_graphs = True  # optimized and quantized graphs of best checkpoint, measured on validation batch
 visualize_model = True
 
-data_generator = DataGenerator.init_from_folder(train_data_dir, train_labels_dir, batch_size=batch_size,
+pipeline_timer = StageTimer(enabled=profile_pipeline)
+data_generator = DataGenerator.init_from_folder(packed_data_file or train_data_dir, train_labels_dir,
+                                                batch_size=batch_size,
                                                 target_width=img_width, target_height=img_height,
                                                 label_flip_pairs=Shared.RubikLoss.get_horizontal_flip_pairs(),
-                                                label_extra_normalization=Shared.RubikLoss.correct_label_orientation)
+                                                label_extra_normalization=Shared.RubikLoss.correct_label_orientation,
+                                                workers=data_workers, io_threads=data_io_threads,
+                                                cache_bytes=data_cache_bytes,
+                                                use_manifest=use_data_manifest,
+                                                revalidate_manifest=revalidate_data_manifest,
+                                                augmentation_store=augmentation_store_file,
+                                                fresh_ratio=fresh_augmentation_ratio,
+                                                timer=pipeline_timer)
 validation_data = data_generator.get_validation_data()
-validation_data.cache_data()
+validation_data.cache_data(memory_budget=validation_cache_budget)
+if data_cache_bytes > 0:
+    data_generator.loader.preload(data_generator.images_files)
 
 steps_per_epoch = len(data_generator) * samples_multiplier
 steps_per_epoch_validation = len(validation_data)
@@ -44,45 +81,108 @@ if load_full_model:
 else:
     model = model_creator.get_model(model_definition,
                                     weights_file_name=weights_file_name,
-                                    loss_function=Shared.RubikLoss.cube_loss3)
+                                    loss_function=Shared.RubikLoss.cube_loss3,
+                                    head=model_head, head_width=model_head_width)
 
 time_stamp = time.strftime("%y%m%d%H%M") + \
              "-" + model_creator.base_model_name + \
              "-" + model.optimizer.__class__.__name__
 
-checkpoint_file = path.join(checkpoints_dir, time_stamp + ".h5")
+checkpoint_file = path.join(checkpoints_dir, time_stamp + "-{epoch:03d}-{val_loss:.4f}.h5")
+checkpoint_writer = CheckpointWriter(keep_last=checkpoints_to_keep)
 
 
 def fit_model(override_epochs=-1):
     tensor_board = keras.callbacks.TensorBoard(log_dir="./Logs/" + time_stamp, histogram_freq=0, write_graph=False)
     reduce_lr = keras.callbacks.ReduceLROnPlateau(monitor="loss", factor=0.5, patience=10, cooldown=1, verbose=1)
-    checkpoint = keras.callbacks.ModelCheckpoint(filepath=checkpoint_file, verbose=1,
-                                                 save_best_only=True, save_weights_only=True)
+    checkpoint = AsyncModelCheckpoint(checkpoint_writer, checkpoint_file, save_best_only=True, verbose=1)
     callbacks = [tensor_board, reduce_lr, checkpoint]
+    if profile_pipeline:
+        callbacks.append(StageTimerCallback(pipeline_timer, "./Logs/" + time_stamp))
 
-    model.fit_generator(data_generator, steps_per_epoch=steps_per_epoch,
+    # workers=0 keeps batches pulled in main thread, so KeyboardInterrupt reaches prefetching generator
+    model.fit_generator(train_batches, steps_per_epoch=steps_per_epoch,
                         epochs=epochs if override_epochs < 1 else override_epochs,
                         validation_data=validation_data, validation_steps=steps_per_epoch_validation,
-                        callbacks=callbacks)
-
-
-if not load_full_model or weights_file_name is None:
-    if weights_file_name is None:
-        fit_model(override_epochs=2)
-        model_creator.unfreeze_top(model)
-        fit_model(override_epochs=10)
-    model_creator.unfreeze_top(model, from_level=0, new_lr=0.0001)
-fit_model()
-
-
+                        callbacks=callbacks, workers=0)
+    print("prefetching: ", train_batches.get_stats())
+
+
+def fit_head_on_features():
+    train_features_file = path.join(checkpoints_dir, time_stamp + "-features.pack")
+    validation_features_file = path.join(checkpoints_dir, time_stamp + "-validation-features.pack")
+    backbone = model_creator.get_backbone_model(model)
+    head_model = model_creator.get_head_model(model)
+    train_features = validation_features = None
+
+    try:
+        start = time.time()
+        build_feature_cache(backbone, data_generator, train_features_file, variants=bottleneck_variants)
+        build_feature_cache(backbone, validation_data, validation_features_file)
+        print("bottleneck features cached in {:.0f} s".format(time.time() - start))
+
+        train_features = FeatureGenerator(train_features_file, batch_size=batch_size)
+        validation_features = FeatureGenerator(validation_features_file, batch_size=batch_size, shuffle=False)
+        tensor_board = keras.callbacks.TensorBoard(log_dir="./Logs/" + time_stamp + "-head", histogram_freq=0,
+                                                   write_graph=False)
+        # head layers are shared, trained weights are already in full model
+        head_model.fit_generator(train_features, epochs=bottleneck_epochs, validation_data=validation_features,
+                                 callbacks=[tensor_board], workers=0)
+    finally:
+        train_features = validation_features = None  # close memory maps before removing files
+        for file_name in [train_features_file, validation_features_file]:
+            if path.isfile(file_name):
+                os.remove(file_name)
+
+
+# head is trained before background prefetching starts, as features cache goes through the same generator
+if weights_file_name is None and cache_bottleneck_features:
+    fit_head_on_features()
+
+train_batches = PrefetchingGenerator(data_generator, queue_size=prefetch_batches)
+
+try:
+    if not load_full_model or weights_file_name is None:
+        if weights_file_name is None:
+            if not cache_bottleneck_features:
+                fit_model(override_epochs=2)
+            model_creator.unfreeze_top(model)
+            fit_model(override_epochs=10)
+        model_creator.unfreeze_top(model, from_level=0, new_lr=0.0001)
+    fit_model()
+    # batch for graphs export and visualization is taken while validation images are still cached
+    validation_images = validation_data.__getitem__(0)[0]
+finally:
+    train_batches.close()
+    data_generator.close()
+    validation_data.invalidate_cache()  # removes validation images spilled to disk
+    validation_data.close()
+    checkpoint_writer.close()  # pending checkpoints are written also when training is interrupted
+
+if data_cache_bytes > 0:
+    print("decoded images cache: ", data_generator.loader.get_cache_stats())
+
+
+best_checkpoint_file = checkpoint_writer.get_latest_file()  # best validation checkpoint of last fit
+
+export_process = None
 if save_model:
     ModelCreator.save(model, path.join(models_dir, time_stamp + ".h5"))
-    ModelCreator.save_tf(model, models_dir, time_stamp + ".pb")
-
-    model.load_weights(checkpoint_file)  # restore weights for best validation checkpoint
-    ModelCreator.save_tf(model, checkpoints_dir, time_stamp + ".pb")
+    # held out images of this run, so models trained from it (e.g. by Distill.py) are validated on unseen data
+    with open(path.join(models_dir, time_stamp + "-validation.txt"), "w") as f:
+        f.write("\n".join(validation_data.images_files) + "\n")
+    # graphs are frozen in separate process, from saved model and best checkpoint
+    export_process = Shared.ExportGraphs.start_export(
+        path.join(models_dir, time_stamp + ".h5"), models_dir, time_stamp,
+        checkpoint_file=best_checkpoint_file, checkpoints_folder=checkpoints_dir,
+        images=validation_images if export_inference_graphs else None)
 
 
 if visualize_model:
-    images, labels = validation_data.__getitem__(0)
-    Shared.Visualizer.show_predictions(images, model.predict(images))
+    if best_checkpoint_file is not None:
+        model.load_weights(best_checkpoint_file)  # restore weights for best validation checkpoint
+    Shared.Visualizer.show_predictions(validation_images, model.predict(validation_images))
+
+if export_process is not None:
+    print("waiting for graphs export...")
+    export_process.wait()
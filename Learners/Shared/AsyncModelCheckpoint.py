@@ -0,0 +1,47 @@
+from keras.callbacks import Callback
+import numpy as np
+
+
+class AsyncModelCheckpoint(Callback):
+    """
+    ModelCheckpoint counterpart which hands weights to CheckpointWriter,
+    so epoch end only waits for in-memory copy of weights, not for disk.
+    File path is formatted with epoch and logs, e.g. "model-{epoch:03d}-{val_loss:.4f}.h5",
+    monitored value is expected to be lower for better model (loss or error).
+    """
+
+    def __init__(self, writer, filepath, monitor="val_loss", save_best_only=True, verbose=0):
+        super(AsyncModelCheckpoint, self).__init__()
+        self.writer = writer
+        self.filepath = filepath
+        self.monitor = monitor
+        self.save_best_only = save_best_only
+        self.verbose = verbose
+        self.best = np.inf
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        file_name = self.filepath.format(epoch=epoch + 1, **logs)
+
+        if self.save_best_only:
+            current = logs.get(self.monitor)
+            if current is None:
+                print("can save best model only with {} available, skipping".format(self.monitor))
+                return
+            if current >= self.best:
+                if self.verbose > 0:
+                    print("epoch {:05d}: {} did not improve from {:.5f}".format(epoch + 1, self.monitor, self.best))
+                return
+            if self.verbose > 0:
+                print("epoch {:05d}: {} improved from {:.5f} to {:.5f}, saving model to {}".format(
+                    epoch + 1, self.monitor, self.best, current, file_name))
+            self.best = current
+
+        self.writer.save(self.model, file_name)
+
+    def on_train_end(self, logs=None):
+        stats = self.writer.get_stats()
+        print("checkpoints: {} saves, training held {:.0f} ms on average ({:.0f} ms snapshot, {:.0f} ms wait), "
+              "background write {:.0f} ms".format(stats["saves"], stats["snapshot_mean_ms"] + stats["wait_mean_ms"],
+                                                  stats["snapshot_mean_ms"], stats["wait_mean_ms"],
+                                                  stats["write_mean_ms"]))
@@ -0,0 +1,87 @@
+from PackedDataset import read_packed_file, write_packed_file
+import multiprocessing
+import numpy as np
+import zlib
+
+# Worker process state, set once by init_worker
+worker_generator = None
+
+
+def init_worker(generator):
+    global worker_generator
+    worker_generator = generator
+
+
+def render_variant(task):
+    image_file, seed = task
+    image, label = worker_generator.load_item(image_file, seed)
+    return image.copy(), label  # image may be reused crop canvas, while pool sends results in chunks
+
+
+def get_variant_seed(seed, image_file, variant):
+    # zlib.crc32 is stable between processes and runs, unlike str hash
+    return (zlib.crc32(image_file.encode("utf-8")) * 31 + seed * 1009 + variant) & 0x7fffffff
+
+
+def materialize(generator, file_name, variants, seed=0, workers=0):
+    """
+    Renders given number of augmented variants for every image of generator into packed store file.
+    Images are stored in target size, labels already normalized as generator returns them.
+    """
+    names = list(generator.images_files)
+    tasks = [(image_file, get_variant_seed(seed, image_file, variant))
+             for image_file in names for variant in range(variants)]
+
+    images, labels = write_packed_file(file_name, names,
+                                       (generator.target_height, generator.target_width, 3),
+                                       (generator.nb_labels,),
+                                       count=len(tasks), extra={"variants": variants, "seed": seed})
+
+    if workers > 0:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(generator.get_worker_copy(),))
+        items = pool.imap(render_variant, tasks, chunksize=16)
+    else:
+        pool = None
+        items = (generator.load_item(image_file, item_seed) for image_file, item_seed in tasks)
+
+    try:
+        for i, (image, label) in enumerate(items):
+            images[i] = image
+            labels[i] = label
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    images.flush()
+    labels.flush()
+    return len(tasks)
+
+
+class AugmentationStore(object):
+    """
+    Reads pre-rendered augmented variants written by materialize.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.open()
+
+    def open(self):
+        header, self.images, self.labels = read_packed_file(self.file_name)
+        self.variants = header["variants"]
+        self.indexes = {header["names"][i]: i for i in range(len(header["names"]))}
+        self.image_shape = tuple(header["image_shape"])
+
+    def has_image(self, image_file):
+        return image_file in self.indexes
+
+    def load_variant(self, image_file, variant):
+        index = self.indexes[image_file] * self.variants + variant
+        return self.images[index], np.array(self.labels[index])
+
+    def __getstate__(self):
+        return {"file_name": self.file_name}
+
+    def __setstate__(self, state):
+        self.file_name = state["file_name"]
+        self.open()
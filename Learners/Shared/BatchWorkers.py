@@ -0,0 +1,57 @@
+import ctypes
+import multiprocessing
+import numpy as np
+import threading
+
+# Worker process state, set once by init_worker
+worker_generator = None
+worker_images = None
+
+
+def init_worker(generator, shared_images, images_shape):
+    global worker_generator, worker_images
+    worker_generator = generator
+    worker_images = np.frombuffer(shared_images, dtype=np.uint8).reshape(images_shape)
+
+
+def load_item_to_slot(task):
+    slot, image_file, seed = task
+    image, label = worker_generator.load_item(image_file, seed)
+    worker_images[slot] = image
+    # stage durations of worker process go back with label to be merged into main timer
+    return label, worker_generator.timer.pop_durations() if worker_generator.timer.enabled else None
+
+
+class BatchWorkerPool(object):
+    """
+    Pool of processes loading and augmenting batch items in parallel.
+    Every worker writes its augmented image straight into the shared batch buffer,
+    only labels (and stage durations of enabled timer) are sent back through the pool pipes.
+    """
+
+    def __init__(self, generator, workers):
+        self.generator = generator
+        self.images_shape = (generator.batch_size, generator.target_height, generator.target_width, 3)
+        self.shared_images = multiprocessing.RawArray(ctypes.c_uint8, int(np.prod(self.images_shape)))
+        self.images = np.frombuffer(self.shared_images, dtype=np.uint8).reshape(self.images_shape)
+
+        # Shared buffer holds single batch, so concurrent callers are served one by one
+        self.lock = threading.Lock()
+
+        self.pool = multiprocessing.Pool(workers, initializer=init_worker,
+                                         initargs=(generator.get_worker_copy(), self.shared_images, self.images_shape))
+
+    def load_batch(self, images_files, seeds, images_out, labels_out):
+        tasks = [(slot, images_files[slot], seeds[slot]) for slot in range(len(images_files))]
+        with self.lock:
+            results = self.pool.map(load_item_to_slot, tasks)
+            start = self.generator.timer.start()
+            self.generator.normalize_images(self.images[:len(tasks)], images_out)
+            self.generator.timer.stop("normalize_images", start)
+        for slot in range(len(results)):
+            labels_out[slot], durations = results[slot]
+            self.generator.timer.merge(durations)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,136 @@
+import h5py
+import numpy as np
+import os
+import queue
+import threading
+import time
+
+
+def snapshot_weights(model):
+    """
+    Copies model weights into memory, grouped by layers as in Keras weights file.
+    Single batch_get_value call, so weights are consistent and device copy is done once.
+    """
+    from keras import __version__ as keras_version
+    from keras import backend as K
+
+    layers = [(layer.name, layer.weights) for layer in model.layers]
+    values = K.batch_get_value([weight for _, weights in layers for weight in weights])
+
+    snapshot = {"backend": K.backend(), "keras_version": keras_version, "layers": []}
+    position = 0
+    for layer_name, weights in layers:
+        weight_names = [str(weight.name) if hasattr(weight, "name") and weight.name else "param_" + str(i)
+                        for i, weight in enumerate(weights)]
+        snapshot["layers"].append((layer_name, weight_names, values[position:position + len(weights)]))
+        position += len(weights)
+    return snapshot
+
+
+def write_weights_file(file_name, snapshot):
+    """ Writes weights snapshot in the layout of Keras save_weights, readable by model.load_weights. """
+    with h5py.File(file_name, "w") as f:
+        f.attrs["layer_names"] = [layer_name.encode("utf8") for layer_name, _, _ in snapshot["layers"]]
+        f.attrs["backend"] = snapshot["backend"].encode("utf8")
+        f.attrs["keras_version"] = str(snapshot["keras_version"]).encode("utf8")
+
+        for layer_name, weight_names, values in snapshot["layers"]:
+            group = f.create_group(layer_name)
+            group.attrs["weight_names"] = [name.encode("utf8") for name in weight_names]
+            for name, value in zip(weight_names, values):
+                dataset = group.create_dataset(name, value.shape, dtype=value.dtype)
+                if not value.shape:
+                    dataset[()] = value
+                else:
+                    dataset[:] = value
+
+
+class CheckpointWriter(object):
+    """
+    Saves model weights without holding training loop on disk:
+    save() copies weights into memory and returns, background thread writes them
+    into temporary file and renames it over target, so checkpoint file is always complete.
+    Only last keep_last written files are kept (0 keeps all), older ones are removed.
+    At most max_pending snapshots wait for writing, further save() calls wait for writer.
+    """
+
+    def __init__(self, keep_last=3, max_pending=1):
+        self.keep_last = keep_last
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.files = []  # written files, oldest first
+        self.error = None
+        self.timings = {"snapshot": [], "wait": [], "write": []}
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def save(self, model, file_name):
+        if self.error is not None:
+            raise self.error
+
+        start = time.perf_counter()
+        snapshot = snapshot_weights(model)
+        snapshot_end = time.perf_counter()
+        self.queue.put((file_name, snapshot))
+        end = time.perf_counter()
+
+        with self.lock:
+            self.timings["snapshot"].append(snapshot_end - start)
+            self.timings["wait"].append(end - snapshot_end)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    break
+                self.write(*item)
+            except Exception as e:  # raised in training thread on next save or flush
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def write(self, file_name, snapshot):
+        start = time.perf_counter()
+        temp_file_name = file_name + ".tmp"
+        write_weights_file(temp_file_name, snapshot)
+        os.replace(temp_file_name, file_name)
+
+        with self.lock:
+            if file_name in self.files:
+                self.files.remove(file_name)
+            self.files.append(file_name)
+            removed = self.files[:-self.keep_last] if self.keep_last > 0 else []
+            self.files = self.files[len(removed):]
+            self.timings["write"].append(time.perf_counter() - start)
+
+        for old_file_name in removed:
+            if os.path.isfile(old_file_name):
+                os.remove(old_file_name)
+
+    def flush(self):
+        """ Waits until all saved snapshots are on disk. """
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def get_latest_file(self):
+        self.flush()
+        with self.lock:
+            return self.files[-1] if self.files else None
+
+    def get_stats(self):
+        """ Count and mean/max milliseconds of in-memory snapshot, wait for writer and background write. """
+        with self.lock:
+            stats = {"saves": len(self.timings["snapshot"]), "files": len(self.files)}
+            for stage, durations in self.timings.items():
+                values = np.array(durations) * 1000.0 if durations else np.zeros(1)
+                stats[stage + "_mean_ms"] = values.mean()
+                stats[stage + "_max_ms"] = values.max()
+        return stats
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
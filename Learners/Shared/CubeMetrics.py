@@ -0,0 +1,47 @@
+"""
+NumPy versions of RubikLoss metrics for whole arrays of (N, 14) labels or (N, 7, 2) points.
+"""
+from RubikLoss import EDGE_ENDS, EDGE_STARTS, POINT_EDGES_COUNT, POINT_EDGES_MATRIX
+import numpy as np
+
+
+def get_points(y):
+    return np.reshape(y, (len(y), 7, 2))
+
+
+def get_edges(points):
+    return np.sqrt(np.square(points[:, EDGE_STARTS] - points[:, EDGE_ENDS]).sum(axis=-1))
+
+
+def point_errors(y_true, y_pred, scale=(1.0, 1.0)):
+    """ Distance between true and predicted points (N, 7), scale converts normalized coordinates to pixels. """
+    return np.sqrt(np.square((get_points(y_true) - get_points(y_pred)) * scale).sum(axis=-1))
+
+
+def edge_errors(y_true, y_pred, scale=(1.0, 1.0)):
+    """ Absolute difference of true and predicted edges lengths (N, 9). """
+    return np.abs(get_edges(get_points(y_true) * scale) - get_edges(get_points(y_pred) * scale))
+
+
+def cube_loss(y_true, y_pred):
+    points_true = get_points(y_true)
+    points_pred = get_points(y_pred)
+    l1 = np.sqrt(np.square(points_true - points_pred).sum(axis=(1, 2)))
+    l2 = np.sqrt(np.square(np.sqrt(get_edges(points_true)) - np.sqrt(get_edges(points_pred))).sum(axis=-1))
+    return l1 + l2
+
+
+def cube_loss2(y_true, y_pred):
+    points_true = get_points(y_true)
+    points_pred = get_points(y_pred)
+    edges_true = get_edges(points_true)
+    edges_pred = get_edges(points_pred)
+
+    points_diff = np.abs(points_true - points_pred).sum(axis=-1)
+    l1 = np.sqrt((points_diff * POINT_EDGES_COUNT / edges_true.dot(POINT_EDGES_MATRIX)).sum(axis=-1))
+    l2 = np.sqrt((np.abs(edges_true - edges_pred) / edges_true).sum(axis=-1))
+    return l1 + l2
+
+
+def cube_loss3(y_true, y_pred):
+    return cube_loss(y_true, y_pred) + cube_loss2(y_true, y_pred) / 40
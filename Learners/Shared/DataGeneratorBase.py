@@ -0,0 +1,630 @@
+from AugmentationStore import AugmentationStore
+from BatchWorkers import BatchWorkerPool
+from DataLoader import DataLoader
+from PackedDataset import PackedDataLoader
+from ReadaheadLoader import ReadaheadLoader
+from StageTimer import StageTimer
+import cv2
+import math
+import numpy as np
+import os
+import random
+import tempfile
+import threading
+import weakref
+#import Visualizer
+
+
+def remove_cache_file(file_name):
+    try:
+        os.remove(file_name)
+    except OSError as e:
+        print("could not remove cache file: ", e)
+
+
+class DataGeneratorBase(object):
+    """
+    Batches of loaded, augmented and normalized images with labels, without any ML framework dependency.
+    DataGenerator adds Keras Sequence interface on top of it.
+    """
+
+    def __init__(self, data_loader, images_files, batch_size=16, augment_data=True,
+                 target_width=299, target_height=299,
+                 label_flip_pairs=[], label_extra_normalization=None,
+                 workers=0, seed=None, output_dtype=np.float32, batch_buffers=0, nb_labels=14,
+                 fused_augmentation=False, augmentation_store=None, fresh_ratio=0.0, readahead_batches=1,
+                 timer=None):
+        self.loader = data_loader
+        self.images_files = list(images_files)
+        self.images_count = len(self.images_files)
+
+        self.batch_size = batch_size
+        self.augment_data = augment_data
+        self.target_width = target_width
+        self.target_height = target_height
+
+        # Compose flip, rotation, scale and crop into single affine warp of source image
+        self.fused_augmentation = fused_augmentation
+
+        # Pre-rendered augmented variants (file made by materialize), mixed with fresh ones in given ratio
+        self.augmentation_store = AugmentationStore(augmentation_store) \
+            if isinstance(augmentation_store, str) else augmentation_store
+        self.fresh_ratio = fresh_ratio
+        if self.augmentation_store is not None and \
+                self.augmentation_store.image_shape != (target_height, target_width, 3):
+            raise ValueError("Augmentation store images size does not match target size")
+
+        self.label_flip_pairs = label_flip_pairs
+        self.label_extra_normalization = label_extra_normalization
+        self.nb_labels = nb_labels
+        self.label_flip_permutation = DataGeneratorBase.get_flip_permutation(label_flip_pairs, nb_labels // 2)
+
+        # Images are scaled to [0, 1] for float types, uint8 keeps raw pixels (to be normalized by model)
+        self.output_dtype = np.dtype(output_dtype)
+
+        # Rotating set of preallocated batch arrays, consumer must not hold more batches than its size.
+        # With batch_buffers=0 every batch gets its own new arrays.
+        self.batch_buffers = batch_buffers
+        self.buffers = []
+        self.buffers_index = 0
+        self.buffers_lock = threading.Lock()
+        self.thread_buffers = threading.local()
+
+        # Cached samples: raw uint8 images and normalized labels, in memory or spilled to memory-mapped file
+        self.is_cached = False
+        self.cache_images = None
+        self.cache_labels = None
+        self.cache_file_name = None
+        self.cache_file_finalizer = None
+
+        # Loader with prefetch (ReadaheadLoader) starts reading files of next batches when batch is loaded
+        self.readahead_batches = readahead_batches
+
+        # Batches are assembled by a pool of worker processes when workers > 0
+        self.workers = workers
+        self.worker_pool = None
+
+        # Durations of pipeline stages, given timer is shared with loader (if it has timer)
+        self.timer = timer if timer is not None else StageTimer()
+        if timer is not None and hasattr(self.loader, "timer"):
+            self.loader.timer = timer
+
+        # Samples order and augmentation depend only on seed and epoch number
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 31)
+        self.epoch = 0
+        random.Random(self.seed).shuffle(self.images_files)
+        self.order = self.get_epoch_order(self.epoch)
+
+    @classmethod
+    def init_from_folder(cls, images_folder, labels_folder, batch_size=16, augment_data=True,
+                         images_extension=".png", labels_extension=".bounds",
+                         target_width=299, target_height=299,
+                         label_flip_pairs=[], label_extra_normalization=None,
+                         workers=0, seed=None, output_dtype=np.float32, batch_buffers=0, nb_labels=14,
+                         cache_bytes=0, use_manifest=False, fused_augmentation=False,
+                         augmentation_store=None, fresh_ratio=0.0, io_threads=0, readahead_batches=1,
+                         timer=None, revalidate_manifest=True):
+
+        if os.path.isfile(images_folder):  # packed dataset file
+            loader = PackedDataLoader(images_folder)
+        else:
+            loader = DataLoader(images_folder, labels_folder, images_extension, labels_extension,
+                                cache_bytes=cache_bytes, use_manifest=use_manifest,
+                                revalidate_manifest=revalidate_manifest)
+            if io_threads > 0:
+                loader = ReadaheadLoader(loader, threads=io_threads)
+        image_files = loader.get_image_file_names()
+
+        return cls(loader, image_files, batch_size=batch_size, augment_data=augment_data,
+                   target_width=target_width, target_height=target_height,
+                   label_flip_pairs=label_flip_pairs, label_extra_normalization=label_extra_normalization,
+                   workers=workers, seed=seed, output_dtype=output_dtype, batch_buffers=batch_buffers,
+                   nb_labels=nb_labels, fused_augmentation=fused_augmentation,
+                   augmentation_store=augmentation_store, fresh_ratio=fresh_ratio,
+                   readahead_batches=readahead_batches, timer=timer)
+
+    def get_validation_data(self, validation_files=None):
+        """
+        Splits off not augmented generator of last 1/8 of shuffled files,
+        or of given files (e.g. held out by run which trained teacher model).
+        """
+        if validation_files is None:
+            training_data_count = self.images_count * 7 // 8 // self.batch_size * self.batch_size
+            validation_files = self.images_files[training_data_count:]
+            self.images_files = self.images_files[:training_data_count]
+        else:
+            held_out = set(validation_files)
+            validation_files = [image_file for image_file in self.images_files if image_file in held_out]
+            self.images_files = [image_file for image_file in self.images_files if image_file not in held_out]
+
+        self.images_count = len(self.images_files)
+        self.order = self.get_epoch_order(self.epoch)
+
+        return type(self)(self.loader, validation_files, batch_size=self.batch_size, augment_data=False,
+                          target_width=self.target_width, target_height=self.target_height,
+                          label_flip_pairs=self.label_flip_pairs,
+                          label_extra_normalization=self.label_extra_normalization,
+                          workers=self.workers, seed=self.seed, output_dtype=self.output_dtype,
+                          nb_labels=self.nb_labels, fused_augmentation=self.fused_augmentation,
+                          readahead_batches=self.readahead_batches)
+
+    # region cache
+
+    def cache_data(self, memory_budget=None, spill_folder=None):
+        """
+        Keeps all samples of current epoch order, normalizing images only when batch is served.
+        Images go to memory-mapped file in spill_folder (or system temp folder) if they exceed memory_budget bytes.
+        """
+        self.invalidate_cache()
+
+        images_shape = (self.images_count, self.target_height, self.target_width, 3)
+        if memory_budget is not None and int(np.prod(images_shape)) > memory_budget:
+            handle, self.cache_file_name = tempfile.mkstemp(suffix=".cache", dir=spill_folder)
+            os.close(handle)
+            # spill file is removed by invalidate_cache, or when generator is collected or interpreter exits
+            self.cache_file_finalizer = weakref.finalize(self, remove_cache_file, self.cache_file_name)
+            self.cache_images = np.memmap(self.cache_file_name, dtype=np.uint8, mode="w+", shape=images_shape)
+        else:
+            self.cache_images = np.empty(images_shape, dtype=np.uint8)
+        self.cache_labels = np.empty((self.images_count, self.nb_labels), dtype=np.float32)
+
+        for start_index in range(0, self.images_count, self.batch_size):
+            last_index = min(start_index + self.batch_size, self.images_count)
+            self.load_batch(start_index, last_index,
+                            self.cache_images[start_index:last_index], self.cache_labels[start_index:last_index])
+
+        self.is_cached = True
+        self.close()
+
+    def invalidate_cache(self):
+        # Call when underlying dataset has changed (then cache_data again to rebuild) or cache is not needed anymore
+        self.is_cached = False
+        self.cache_images = None
+        self.cache_labels = None
+        if self.cache_file_finalizer is not None:
+            self.cache_file_finalizer()
+            self.cache_file_finalizer = None
+            self.cache_file_name = None
+
+    def get_cached_batch(self, start_index, last_index, images_out, labels_out):
+        self.normalize_images(self.cache_images[start_index:last_index], images_out)
+        labels_out[...] = self.cache_labels[start_index:last_index]
+
+    # endregion
+
+    # region worker_pool
+
+    def get_worker_pool(self):
+        if self.worker_pool is None:
+            self.worker_pool = BatchWorkerPool(self, self.workers)
+        return self.worker_pool
+
+    def close(self):
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
+        if hasattr(self.loader, "close"):
+            self.loader.close()
+
+    def __getstate__(self):
+        # Worker processes get their own copy of generator, but not the pool itself
+        state = self.__dict__.copy()
+        state["worker_pool"] = None
+        state["cache_images"] = None
+        state["cache_labels"] = None
+        state["cache_file_name"] = None  # spill file belongs to the generator which made it
+        state["cache_file_finalizer"] = None
+        state["buffers"] = []
+        del state["buffers_lock"]
+        del state["thread_buffers"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.buffers_lock = threading.Lock()
+        self.thread_buffers = threading.local()
+
+    def get_worker_copy(self):
+        """ Copy of generator state as base class instance, so worker processes do not import Keras. """
+        copy = DataGeneratorBase.__new__(DataGeneratorBase)
+        copy.__setstate__(self.__getstate__())
+        return copy
+
+    # endregion
+
+    # region buffers
+
+    def get_batch_buffers(self, count):
+        images_shape = (self.batch_size, self.target_height, self.target_width, 3)
+        labels_shape = (self.batch_size, self.nb_labels)
+
+        if self.batch_buffers <= 0:
+            images = np.empty(images_shape, dtype=self.output_dtype)
+            labels = np.empty(labels_shape, dtype=np.float32)
+        else:
+            with self.buffers_lock:
+                if len(self.buffers) < self.batch_buffers:
+                    self.buffers.append((np.empty(images_shape, dtype=self.output_dtype),
+                                         np.empty(labels_shape, dtype=np.float32)))
+                images, labels = self.buffers[self.buffers_index % len(self.buffers)]
+                self.buffers_index += 1
+
+        return images[:count], labels[:count]
+
+    def get_crop_canvas(self):
+        # Crop result is copied into batch right away, so every thread can keep reusing single canvas
+        canvas = getattr(self.thread_buffers, "crop_canvas", None)
+        if canvas is None:
+            canvas = np.empty((self.target_height, self.target_width, 3), dtype=np.uint8)
+            self.thread_buffers.crop_canvas = canvas
+        return canvas
+
+    def normalize_images(self, images, out):
+        if out.dtype == np.uint8:
+            out[...] = images
+        else:
+            np.multiply(images, 1.0 / 255.0, out=out, dtype=out.dtype)
+
+    # endregion
+
+    # region epoch_order
+
+    def get_epoch_order(self, epoch):
+        return np.random.RandomState((self.seed + epoch) % 2 ** 32).permutation(self.images_count)
+
+    def get_sample_seed(self, position, wrap=0):
+        # wrap counts passes over data within epoch (idx beyond len), each pass gets new augmentations
+        return hash((self.seed, self.epoch, wrap, position)) & 0x7fffffff
+
+    # endregion
+
+    def __len__(self):
+        return int(np.ceil(self.images_count / float(self.batch_size)))
+
+    def on_epoch_end(self):
+        if not self.is_cached:
+            self.epoch += 1
+            self.order = self.get_epoch_order(self.epoch)
+
+    def __getitem__(self, idx):
+        start_index = idx * self.batch_size % self.images_count
+        last_index = min(start_index + self.batch_size, self.images_count)
+
+        start = self.timer.start()
+        batch_images, batch_labels = self.get_batch_buffers(last_index - start_index)
+
+        if self.is_cached:
+            self.get_cached_batch(start_index, last_index, batch_images, batch_labels)
+        else:
+            self.load_batch(start_index, last_index, batch_images, batch_labels,
+                            wrap=idx * self.batch_size // self.images_count)
+
+        self.timer.stop("batch", start)
+        return batch_images, batch_labels
+
+    def get_batch_files(self, idx):
+        # Files of batch idx in current epoch order
+        start_index = idx * self.batch_size % self.images_count
+        last_index = min(start_index + self.batch_size, self.images_count)
+        return [self.images_files[index] for index in self.order[start_index:last_index]]
+
+    def load_batch(self, start_index, last_index, images_out, labels_out, wrap=0):
+        batch_files = [self.images_files[index] for index in self.order[start_index:last_index]]
+        batch_seeds = [self.get_sample_seed(position, wrap) for position in range(start_index, last_index)]
+
+        if self.workers > 0:
+            self.get_worker_pool().load_batch(batch_files, batch_seeds, images_out, labels_out)
+            return
+
+        if hasattr(self.loader, "prefetch"):
+            readahead_index = min(last_index + self.readahead_batches * self.batch_size, self.images_count)
+            self.loader.prefetch([self.images_files[index] for index in self.order[start_index:readahead_index]])
+
+        for slot in range(len(batch_files)):
+            image, label = self.load_item(batch_files[slot], batch_seeds[slot])
+
+            # Visualizer.show_image(image, label, title=batch_files[slot])  # check augmentation result
+            start = self.timer.start()
+            self.normalize_images(image, images_out[slot])
+            labels_out[slot] = label
+            self.timer.stop("normalize_images", start)
+
+    def load_item(self, image_file, seed):
+        random.seed(seed)
+
+        start = self.timer.start()
+        if self.augmentation_store is not None and self.augmentation_store.has_image(image_file) and \
+                random.random() >= self.fresh_ratio:
+            item = self.augmentation_store.load_variant(image_file, random.randrange(self.augmentation_store.variants))
+            self.timer.stop("stored_variant", start)
+            return item
+
+        image, label = self.loader.load_image_and_labels(image_file)
+        image, label = self.augment_item(image, label)
+
+        start = self.timer.start()
+        label = self.normalize_label(label)
+        self.timer.stop("normalize_label", start)
+
+        return image, label
+
+    # region normalize_label
+
+    def normalize_label(self, label):
+        if self.label_extra_normalization is not None:
+            label = self.label_extra_normalization(label)
+        label = self.scale_label(label)
+        label = self.flatten_label(label)
+        return label
+
+    def scale_label(self, label):
+        return label / np.array([self.target_width, self.target_height], dtype=np.float32)
+
+    @staticmethod
+    def flatten_label(label):
+        return label.reshape(-1)
+
+    @staticmethod
+    def flatten_labels(labels):
+        return labels.reshape(len(labels), -1)
+
+    # endregion
+
+    # region augment_item
+
+    def augment_item(self, image, label):
+        start = self.timer.start()
+        if self.fused_augmentation:
+            image, label = self.augment_item_fused(image, label)
+            self.timer.stop("fused_augmentation", start)
+            return image, label
+
+        if self.augment_data and random.random() > 0.5:
+            image, label = self.flip_image_lr(image, label)
+            start = self.timer.stop("flip", start)
+
+        original_height = image.shape[0]
+        original_width = image.shape[1]
+
+        if self.augment_data:
+            image, label = self.random_rotate(image, label)
+            start = self.timer.stop("rotate", start)
+        image, label = self.random_scale(image, label, original_height, original_width)
+        start = self.timer.stop("scale", start)
+        image, label = self.random_crop(image, label)
+        self.timer.stop("crop", start)
+
+        return image, label
+
+    # region augment_item_fused
+
+    def augment_item_fused(self, image, label):
+        """
+        Same random flip, rotation, scale and crop as augment_item, but collected into single affine matrix
+        and applied to image with one warp producing target size output.
+        """
+        image_height = image.shape[0]
+        image_width = image.shape[1]
+
+        matrix = np.eye(3)
+        is_flipped = self.augment_data and random.random() > 0.5
+        if is_flipped:
+            label = label[self.label_flip_permutation]
+            matrix = np.array([[-1.0, 0.0, image_width], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+
+        height = image_height
+        width = image_width
+
+        if self.augment_data:
+            rotation = self.get_random_rotation(DataGeneratorBase.transform_label(label, matrix), height, width)
+            if rotation is not None:
+                angle, increase_width, increase_height = rotation
+                height += 2 * increase_height
+                width += 2 * increase_width
+                rotate = np.vstack([cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1), [0.0, 0.0, 1.0]])
+                matrix = rotate.dot(DataGeneratorBase.get_shift_matrix(increase_width, increase_height)).dot(matrix)
+
+        new_height, new_width = self.get_random_scale_size(height, width, image_height, image_width)
+        if new_height != height and new_width != width:
+            matrix = np.diag([new_width / width, new_height / height, 1.0]).dot(matrix)
+            height = new_height
+            width = new_width
+
+        if height != self.target_height or width != self.target_width:
+            dx, dy = self.get_crop_shift(DataGeneratorBase.transform_label(label, matrix), height, width)
+            matrix = DataGeneratorBase.get_shift_matrix(-dx, -dy).dot(matrix)
+
+        label = DataGeneratorBase.transform_label(label, matrix)
+
+        if is_flipped:  # cv2.flip maps pixel x to width - 1 - x, labels use width - x
+            matrix = matrix.dot(DataGeneratorBase.get_shift_matrix(1, 0))
+        border = tuple(int(c) for c in image[0, 0])
+        image = cv2.warpAffine(image, matrix[:2], (self.target_width, self.target_height), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=border)
+
+        return image, label
+
+    @staticmethod
+    def transform_label(label, matrix):
+        return (label.dot(matrix[:2, :2].T) + matrix[:2, 2]).astype(np.float32)
+
+    @staticmethod
+    def get_shift_matrix(dx, dy):
+        return np.array([[1.0, 0.0, dx], [0.0, 1.0, dy], [0.0, 0.0, 1.0]])
+
+    # endregion
+
+    # region flip_image
+
+    def flip_image_lr(self, image, label):
+        image = cv2.flip(image, 1)
+
+        label = label[self.label_flip_permutation]
+        label[:, 0] = image.shape[1] - label[:, 0]
+
+        return image, label
+
+    @staticmethod
+    def get_flip_permutation(label_flip_pairs, points_count):
+        permutation = np.arange(points_count)
+        for a, b in label_flip_pairs:
+            permutation[a], permutation[b] = permutation[b], permutation[a]
+        return permutation
+
+    # endregion
+
+    # region random_rotate
+
+    def random_rotate(self, image, label):
+        image_height = image.shape[0]
+        image_width = image.shape[1]
+
+        rotation = self.get_random_rotation(label, image_height, image_width)
+        if rotation is None:
+            return image, label
+        angle, increase_width, increase_height = rotation
+
+        if increase_height > 0 or increase_width > 0:
+            new_height = image_height + 2 * increase_height
+            new_width = image_width + 2 * increase_width
+            dy = increase_height
+            dx = increase_width
+
+            new_image = np.zeros((new_height, new_width, image.shape[2]), dtype=np.uint8)
+            new_image[:, :, :] = image[0, 0, :]
+            new_image[dy:dy + image_height, dx:dx + image_width, :] = image
+
+            label = label + np.array([dx, dy], dtype=np.float32)
+        else:
+            new_image = image
+            new_height = image_height
+            new_width = image_width
+
+        matrix = cv2.getRotationMatrix2D((new_width / 2, new_height / 2), angle, 1)
+        new_image = cv2.warpAffine(new_image, matrix, (new_width, new_height), flags=cv2.INTER_LINEAR)
+        new_label = cv2.transform(label[np.newaxis], matrix)[0]
+
+        return new_image, new_label
+
+    @staticmethod
+    def get_random_rotation(label, image_height, image_width):
+        """ Returns rotation angle and canvas increase for both sides (width, height), or None for no rotation. """
+        min_x, min_y, max_x, max_y = DataGeneratorBase.get_label_bounds(label, image_height, image_width)
+        if min_x < 0 or min_y < 0 or max_x >= image_width or max_y >= image_height:
+            return None
+
+        angle = random.uniform(-90.0, 90.0)
+        if abs(angle) < .1:
+            return None
+
+        corners = np.array([[min_x, min_y], [min_x, max_y], [max_x, min_y], [max_x, max_y]])
+        max_distance = np.sqrt(np.square(corners - (image_width / 2, image_height / 2)).sum(axis=1)).max()
+
+        max_dy = max_distance * abs(math.sin(math.radians(angle)))
+        max_dx = max_distance * abs(math.cos(math.radians(angle)))
+        if max_dy < 2 or max_dx < 2:  # no visible rotation
+            return None
+
+        increase_height = int(max([0, 0 - (min_y - max_dy), max_y + max_dy - image_height]))
+        increase_width = int(max([0, 0 - (min_x - max_dx), max_x + max_dx - image_width]))
+        return angle, increase_width, increase_height
+
+    # endregion
+
+    # region random_scale
+
+    def random_scale(self, image, label, original_height, original_width):
+        image_height = image.shape[0]
+        image_width = image.shape[1]
+
+        new_height, new_width = self.get_random_scale_size(image_height, image_width, original_height, original_width)
+
+        if new_height != image_height and new_width != image_width:  # both sizes should be different (to keep aspect)
+            image = cv2.resize(image, (new_width, new_height))
+            label = label * np.array([new_width / image_width, new_height / image_height], dtype=np.float32)
+
+        return image, label
+
+    def get_random_scale_size(self, image_height, image_width, original_height, original_width):
+        random_coeff = random.uniform(0.8, 1.2) if self.augment_data else 1.0
+        scale = max(self.target_height / original_height, self.target_width / original_width) * random_coeff
+        return int(image_height * scale + 0.5), int(image_width * scale + 0.5)
+
+    # endregion
+
+    # region random_crop
+
+    def random_crop(self, image, label):
+        image_height = image.shape[0]
+        image_width = image.shape[1]
+        if image_height == self.target_height and image_width == self.target_width:
+            return image, label
+
+        dx, dy = self.get_crop_shift(label, image_height, image_width)
+
+        label = label - np.array([dx, dy], dtype=np.float32)
+
+        sx0 = dx if dx >= 0 else 0
+        sy0 = dy if dy >= 0 else 0
+        sx1 = min(dx + self.target_width, image_width)
+        sy1 = min(dy + self.target_height, image_height)
+
+        tx0 = 0 if dx >= 0 else -dx
+        ty0 = 0 if dy >= 0 else -dy
+        tx1 = tx0 + sx1 - sx0
+        ty1 = ty0 + sy1 - sy0
+
+        result = self.get_crop_canvas()
+        result[:, :, :] = image[0, 0, :]
+        result[ty0:ty1, tx0:tx1, :] = image[sy0:sy1, sx0:sx1, :]
+
+        return result, label
+
+    def get_crop_shift(self, label, image_height, image_width):
+        if self.augment_data:
+            min_x, min_y, max_x, max_y = DataGeneratorBase.get_label_bounds(label, image_height, image_width)
+
+            min_dx, max_dx = self.get_shift_limits(min_x, max_x, image_width, self.target_width)
+            min_dy, max_dy = self.get_shift_limits(min_y, max_y, image_height, self.target_height)
+            dx = int(random.uniform(min_dx, max_dx) + 0.5)
+            dy = int(random.uniform(min_dy, max_dy) + 0.5)
+        else:
+            dx = (image_width - self.target_width) // 2
+            dy = (image_height - self.target_height) // 2
+        return dx, dy
+
+    @staticmethod
+    def get_label_bounds(label, image_height, image_width):
+        min_x, min_y = label.min(axis=0)
+        max_x, max_y = label.max(axis=0)
+        return min(min_x, image_width), min(min_y, image_height), max(max_x, 0), max(max_y, 0)
+
+    @staticmethod
+    def get_shift_limits(min_label, max_label, size, target_size):
+        label_size = max_label - min_label
+        if label_size < target_size:
+            min_shift = max_label - target_size
+            max_shift = min_label
+        else:
+            min_shift = min_label
+            max_shift = max_label - target_size
+
+        if min_label < 0:
+            min_shift = 0
+            if label_size < target_size:
+                max_shift = min_shift
+        if max_label > size:
+            max_shift = size - target_size
+            if label_size < target_size:
+                min_shift = max_shift
+
+        if max_shift < min_shift:
+            t = max_shift
+            max_shift = min_shift
+            min_shift = t
+
+        return min_shift, max_shift
+
+    # endregion
+
+    # endregion
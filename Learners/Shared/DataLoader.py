@@ -1,16 +1,28 @@
+from DatasetManifest import DatasetManifest
+from ImageCache import ImageCache
+from StageTimer import StageTimer
 import os
 import cv2
+import numpy as np
 
 
 class DataLoader(object):
     def __init__(self, images_folder, labels_folder,
-                 images_extension, labels_extension):
+                 images_extension, labels_extension, cache_bytes=0, use_manifest=False, revalidate_manifest=True):
         self.imagesFolder = images_folder
         self.labelsFolder = labels_folder
         self.imagesExtension = images_extension
         self.labelsExtension = labels_extension
+        self.cache = ImageCache(cache_bytes) if cache_bytes > 0 else None
+        self.manifest = DatasetManifest(self) if use_manifest else None
+        self.revalidate_manifest = revalidate_manifest  # False trusts saved manifest without checking folders
+        self.timer = StageTimer()
 
     def get_image_file_names(self):
+        if self.manifest is not None:
+            self.manifest.load(revalidate=self.revalidate_manifest)
+            return self.manifest.get_image_file_names()
+
         file_names = []
 
         for image_file in os.listdir(self.imagesFolder):
@@ -33,14 +45,55 @@ class DataLoader(object):
                 y = float(parts[1])
                 labels.append((x, y))
 
-        return labels
+        return np.array(labels, dtype=np.float32)
 
     def load_image_and_labels(self, image_file_name):
+        start = self.timer.start()
+        if self.cache is not None:
+            item = self.cache.get(image_file_name)
+            if item is not None:
+                image, labels = item
+                self.timer.stop("cache_hit", start)
+                return image, labels.copy()
+
         full_image_file_name = os.path.join(self.imagesFolder, image_file_name)
         labels_file_name = os.path.splitext(image_file_name)[0] + self.labelsExtension
         full_labels_file_name = os.path.join(self.labelsFolder, labels_file_name)
 
-        image = cv2.imread(full_image_file_name)
-        labels = self.load_labels(full_labels_file_name)
+        data = self.read_file(full_image_file_name)
+        start = self.timer.stop("read", start)
+        image = self.decode_image(data)
+        start = self.timer.stop("decode", start)
+        if self.manifest is not None and self.manifest.is_loaded:
+            labels = self.manifest.get_labels(image_file_name)
+        else:
+            labels = self.load_labels(full_labels_file_name)
+        self.timer.stop("labels", start)
+
+        if self.cache is not None:
+            image.flags.writeable = False  # cached image is shared by all later reads
+            self.cache.put(image_file_name, image, labels.copy())
 
         return image, labels
+
+    @staticmethod
+    def read_image(full_image_file_name):
+        return DataLoader.decode_image(DataLoader.read_file(full_image_file_name))
+
+    @staticmethod
+    def read_file(full_file_name):
+        # Reading and decoding from memory both release GIL, so concurrent reader threads overlap
+        with open(full_file_name, "rb") as f:
+            return np.frombuffer(f.read(), dtype=np.uint8)
+
+    @staticmethod
+    def decode_image(data):
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def preload(self, image_file_names):
+        # Fill cache before worker processes are started, so they share it
+        for image_file_name in image_file_names:
+            self.load_image_and_labels(image_file_name)
+
+    def get_cache_stats(self):
+        return self.cache.get_stats() if self.cache is not None else None
@@ -0,0 +1,93 @@
+import json
+import numpy as np
+import os
+
+
+class DatasetManifest(object):
+    """
+    Index of labeled images (image names, labels files sizes, modification times and parsed labels)
+    saved next to images. Revalidation lists images folder by names only, as images are read from disk anyway,
+    and stats every labels file, so labels edited in place are parsed again. Without revalidation
+    manifest is trusted as it is and start reads only manifest file.
+    """
+
+    FILE_NAME = ".manifest.json"
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.file_name = os.path.join(loader.imagesFolder, DatasetManifest.FILE_NAME)
+        self.images = []  # image file names
+        self.labels = {}  # labels file name -> [size, mtime, labels]
+        self.is_loaded = False
+
+    def load(self, revalidate=True):
+        if os.path.isfile(self.file_name):
+            with open(self.file_name) as f:
+                data = json.load(f)
+            if data["images_extension"] == self.loader.imagesExtension and \
+                    data["labels_extension"] == self.loader.labelsExtension:
+                self.images = sorted(data["images"])  # older manifests have dict with sizes and times
+                self.labels = data["labels"]
+                self.is_loaded = True
+
+        if revalidate or not self.is_loaded:
+            if self.update():
+                self.save()
+        self.is_loaded = True
+
+    def save(self):
+        data = {"images_extension": self.loader.imagesExtension,
+                "labels_extension": self.loader.labelsExtension,
+                "images": self.images,
+                "labels": self.labels}
+        temp_file_name = self.file_name + ".tmp"
+        try:
+            with open(temp_file_name, "w") as f:
+                json.dump(data, f)
+            os.replace(temp_file_name, self.file_name)
+        except OSError as e:
+            print("could not save dataset manifest: ", e)
+
+    @staticmethod
+    def list_names(folder, extension):
+        # is_file comes with directory entries on most platforms, so no stat call per image
+        with os.scandir(folder) as entries:
+            return sorted(entry.name for entry in entries if entry.name.endswith(extension) and entry.is_file())
+
+    @staticmethod
+    def scan(folder, extension):
+        files = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.endswith(extension) and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = [stat.st_size, stat.st_mtime]
+        return files
+
+    def update(self):
+        """ Relists images, parses new or changed labels files. Returns True if anything has changed. """
+        images = DatasetManifest.list_names(self.loader.imagesFolder, self.loader.imagesExtension)
+        labels_stats = DatasetManifest.scan(self.loader.labelsFolder, self.loader.labelsExtension)
+
+        labels = {}
+        for labels_file, stat in labels_stats.items():
+            known = self.labels.get(labels_file)
+            if known is not None and known[:2] == stat:
+                labels[labels_file] = known
+            else:
+                parsed = self.loader.load_labels(os.path.join(self.loader.labelsFolder, labels_file))
+                labels[labels_file] = stat + [parsed.tolist()]
+
+        is_changed = images != self.images or labels != self.labels
+        self.images = images
+        self.labels = labels
+        return is_changed
+
+    def get_labels_file_name(self, image_file_name):
+        return os.path.splitext(image_file_name)[0] + self.loader.labelsExtension
+
+    def get_image_file_names(self):
+        return [image_file for image_file in self.images if self.get_labels_file_name(image_file) in self.labels]
+
+    def get_labels(self, image_file_name):
+        return np.array(self.labels[self.get_labels_file_name(image_file_name)][2], dtype=np.float32)
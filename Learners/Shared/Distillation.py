@@ -0,0 +1,105 @@
+from AugmentationStore import AugmentationStore
+import CubeMetrics
+from keras.utils import Sequence
+import numpy as np
+import time
+
+
+def cache_teacher_predictions(teacher, store_file, predictions_file, batch_size=32):
+    """
+    Runs teacher once over every augmented variant of store, saves predictions as .npy in store order.
+    """
+    store = AugmentationStore(store_file)
+    count = len(store.images)
+    predictions = np.lib.format.open_memmap(predictions_file, mode="w+", dtype=np.float32,
+                                            shape=(count, store.labels.shape[-1]))
+    for start in range(0, count, batch_size):
+        images = np.multiply(store.images[start:start + batch_size], 1.0 / 255.0, dtype=np.float32)
+        predictions[start:start + batch_size] = teacher.predict_on_batch(images)
+    predictions.flush()
+    del predictions
+    return count
+
+
+class DistillationGenerator(Sequence):
+    """
+    Batches of stored augmented variants of given images with targets made of ground truth and cached teacher
+    predictions concatenated (batch, 2 * labels count), as RubikLoss.distillation_loss expects.
+    """
+
+    def __init__(self, store_file, predictions_file, images_files, batch_size=32, seed=None):
+        self.store = AugmentationStore(store_file)
+        self.predictions = np.load(predictions_file, mmap_mode="r")
+        self.batch_size = batch_size
+
+        # only images of training split, so validation images are not seen through their variants
+        self.indexes = np.array([self.store.indexes[image_file] * self.store.variants + variant
+                                 for image_file in images_files if self.store.has_image(image_file)
+                                 for variant in range(self.store.variants)], dtype=np.int64)
+
+        self.seed = np.random.randint(0, 2 ** 31 - 1) if seed is None else seed
+        self.epoch = 0
+        self.order = self.get_epoch_order(self.epoch)
+
+    def get_epoch_order(self, epoch):
+        return self.indexes[np.random.RandomState(self.seed + epoch).permutation(len(self.indexes))]
+
+    def __len__(self):
+        return int(np.ceil(len(self.indexes) / float(self.batch_size)))
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self.order = self.get_epoch_order(self.epoch)
+
+    def __getitem__(self, idx):
+        indexes = np.sort(self.order[idx * self.batch_size:(idx + 1) * self.batch_size])
+        images = np.multiply(self.store.images[indexes], 1.0 / 255.0, dtype=np.float32)
+        targets = np.concatenate([self.store.labels[indexes], self.predictions[indexes]], axis=-1)
+        return images, targets
+
+
+def measure_latency(model, image_shape, runs=20):
+    """ Median single image prediction time in milliseconds. """
+    image = np.random.rand(1, *image_shape).astype(np.float32)
+    model.predict_on_batch(image)  # warm-up
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict_on_batch(image)
+        latencies.append(time.perf_counter() - start)
+    return np.median(latencies) * 1000.0
+
+
+def evaluate(model, generator):
+    """ Mean cube_loss3 and keypoint error (pixels) on ground truth of not augmented generator. """
+    losses = []
+    point_errors = []
+    for idx in range(len(generator)):
+        images, labels = generator[idx]
+        predictions = model.predict_on_batch(images)
+        losses.append(CubeMetrics.cube_loss3(labels, predictions))
+        point_errors.append(CubeMetrics.point_errors(labels, predictions,
+                                                     (generator.target_width, generator.target_height)).mean(axis=-1))
+    return np.concatenate(losses).mean(), np.concatenate(point_errors).mean()
+
+
+def compare(teacher, student, generator):
+    """ Prints and returns student accuracy gap and latency speedup over teacher. """
+    image_shape = (generator.target_height, generator.target_width, 3)
+    results = {}
+    for name, model in [("teacher", teacher), ("student", student)]:
+        cube_loss3, point_error = evaluate(model, generator)
+        results[name] = {"params_m": model.count_params() / 1e6,
+                         "latency_ms": measure_latency(model, image_shape),
+                         "cube_loss3": cube_loss3,
+                         "point_error_px": point_error}
+
+    print("{:<10}{:>10}{:>12}{:>12}{:>16}".format("model", "params_m", "latency_ms", "cube_loss3", "point_error_px"))
+    for name, result in results.items():
+        print("{:<10}{:>10.2f}{:>12.2f}{:>12.5f}{:>16.3f}".format(name, result["params_m"], result["latency_ms"],
+                                                                  result["cube_loss3"], result["point_error_px"]))
+    results["speedup"] = results["teacher"]["latency_ms"] / results["student"]["latency_ms"]
+    results["point_error_gap_px"] = results["student"]["point_error_px"] - results["teacher"]["point_error_px"]
+    print("student is {:.1f}x faster, keypoint error gap {:+.3f} px".format(results["speedup"],
+                                                                           results["point_error_gap_px"]))
+    return results
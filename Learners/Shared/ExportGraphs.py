@@ -0,0 +1,70 @@
+import argparse
+import numpy as np
+import os
+import subprocess
+import sys
+import tempfile
+
+import RubikLoss
+from ModelCreator import ModelCreator
+
+
+def export(model_file, models_folder, name, checkpoint_file=None, checkpoints_folder=None, images=None):
+    """
+    Freezes saved Keras model as name.pb into models folder, then with weights of checkpoint
+    as name.pb into checkpoints folder, and measures inference variants of it on images.
+    """
+    RubikLoss.register_losses()
+    model = ModelCreator().load(model_file)
+    ModelCreator.save_tf(model, models_folder, name + ".pb")
+
+    if checkpoint_file is not None:
+        model.load_weights(checkpoint_file)
+        ModelCreator.save_tf(model, checkpoints_folder, name + ".pb")
+
+        if images is not None:
+            ModelCreator.export_tf(model, checkpoints_folder, name + "-inference", images)
+
+
+def start_export(model_file, models_folder, name, checkpoint_file=None, checkpoints_folder=None, images=None):
+    """
+    Runs export in separate CPU-only process, so training process neither waits for it
+    nor shares GPU memory with it. Returns subprocess.Popen to wait for.
+    """
+    command = [sys.executable, os.path.abspath(__file__), model_file, models_folder, name]
+    if checkpoint_file is not None:
+        command += ["--checkpoint_file", checkpoint_file, "--checkpoints_folder", checkpoints_folder]
+    if images is not None:
+        handle, images_file = tempfile.mkstemp(suffix=".npy")
+        with os.fdopen(handle, "wb") as f:
+            np.save(f, images)
+        command += ["--images_file", images_file, "--remove_images_file"]
+
+    environment = dict(os.environ)
+    environment["CUDA_VISIBLE_DEVICES"] = ""
+    return subprocess.Popen(command, env=environment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Freeze Keras model and its best checkpoint into TensorFlow graphs")
+    parser.add_argument("model_file", help="Keras model saved by ModelCreator.save")
+    parser.add_argument("models_folder")
+    parser.add_argument("name", help="graph file name without extension")
+    parser.add_argument("--checkpoint_file", default=None, help="weights file to freeze into checkpoints folder")
+    parser.add_argument("--checkpoints_folder", default=None)
+    parser.add_argument("--images_file", default=None, help=".npy batch to measure optimized inference graphs on")
+    parser.add_argument("--remove_images_file", action="store_true")
+    args = parser.parse_args()
+
+    images = None
+    if args.images_file is not None:
+        images = np.load(args.images_file)
+        if args.remove_images_file:
+            os.remove(args.images_file)
+
+    export(args.model_file, args.models_folder, args.name, checkpoint_file=args.checkpoint_file,
+           checkpoints_folder=args.checkpoints_folder or args.models_folder, images=images)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+from PackedDataset import read_packed_file, write_packed_file
+from keras.utils import Sequence
+import numpy as np
+
+
+def build_feature_cache(backbone, generator, file_name, variants=1, dtype=np.float16):
+    """
+    Runs frozen backbone once per sample of given number of generator epochs (each epoch is new augmentation)
+    and saves features with labels into packed file. Returns number of cached samples.
+    """
+    feature_shape = backbone.output_shape[1:]
+    count = generator.images_count * variants
+    features, labels = write_packed_file(file_name, list(generator.images_files), feature_shape,
+                                         (generator.nb_labels,), count=count,
+                                         extra={"variants": variants}, image_dtype=dtype)
+
+    position = 0
+    for variant in range(variants):
+        if variant > 0:
+            generator.on_epoch_end()
+        for idx in range(len(generator)):
+            batch_images, batch_labels = generator[idx]
+            batch_features = backbone.predict_on_batch(batch_images)
+            features[position:position + len(batch_features)] = batch_features
+            labels[position:position + len(batch_labels)] = batch_labels
+            position += len(batch_features)
+
+    features.flush()
+    labels.flush()
+    del features, labels
+    return count
+
+
+class FeatureGenerator(Sequence):
+    """
+    Batches of cached backbone features and labels, shuffled every epoch, for training head model.
+    """
+
+    def __init__(self, file_name, batch_size=32, shuffle=True, seed=None):
+        _, self.features, self.labels = read_packed_file(file_name)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = np.random.randint(0, 2 ** 31 - 1) if seed is None else seed
+        self.epoch = 0
+        self.order = self.get_epoch_order(self.epoch)
+
+    def get_epoch_order(self, epoch):
+        if not self.shuffle:
+            return np.arange(len(self.labels))
+        return np.random.RandomState(self.seed + epoch).permutation(len(self.labels))
+
+    def __len__(self):
+        return int(np.ceil(len(self.labels) / float(self.batch_size)))
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self.order = self.get_epoch_order(self.epoch)
+
+    def __getitem__(self, idx):
+        # sorted indexes read memory mapped file forward
+        indexes = np.sort(self.order[idx * self.batch_size:(idx + 1) * self.batch_size])
+        return self.features[indexes].astype(np.float32), self.labels[indexes]
@@ -0,0 +1,141 @@
+import argparse
+from collections import deque
+import cv2
+import numpy as np
+import os
+import tensorflow as tf
+import time
+
+
+class FrozenGraphRuntime(object):
+    """
+    Keypoints inference with frozen graph (made by ModelCreator.save_tf) in single warmed-up session.
+    Images are prepared as not augmented DataGenerator does: scaled to cover target size and center-cropped.
+    """
+
+    def __init__(self, file_name, batch_size=32, image_width=299, image_height=299,
+                 output_node_name="output_1", intra_op_threads=0, inter_op_threads=0, use_gpu=True,
+                 stats_window=10000):
+        self.batch_size = batch_size
+        self.image_width = image_width
+        self.image_height = image_height
+
+        graph_def = tf.GraphDef()
+        with open(file_name, "rb") as f:
+            graph_def.ParseFromString(f.read())
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name="")
+        self.input_tensor = [op for op in self.graph.get_operations() if op.type == "Placeholder"][0].outputs[0]
+        self.output_tensor = self.graph.get_tensor_by_name(output_node_name + ":0")
+
+        config = tf.ConfigProto(intra_op_parallelism_threads=intra_op_threads,
+                                inter_op_parallelism_threads=inter_op_threads,
+                                device_count=None if use_gpu else {"GPU": 0})
+        self.session = tf.Session(graph=self.graph, config=config)
+
+        self.batch_times = deque(maxlen=stats_window)  # percentiles are taken over recent batches only
+        self.batches_count = 0
+        self.images_count = 0
+        self.total_time = 0.0
+
+        # First run allocates and optimizes everything, keep it out of timings
+        self.predict_normalized(np.zeros((batch_size, image_height, image_width, 3), dtype=np.float32))
+
+    def preprocess(self, image):
+        """ Returns target size image and (scale_x, scale_y, dx, dy) to map keypoints back to source image. """
+        image_height = image.shape[0]
+        image_width = image.shape[1]
+
+        scale = max(self.image_height / image_height, self.image_width / image_width)
+        new_height = int(image_height * scale + 0.5)
+        new_width = int(image_width * scale + 0.5)
+        if new_height != image_height and new_width != image_width:
+            image = cv2.resize(image, (new_width, new_height))
+        else:
+            new_height = image_height
+            new_width = image_width
+
+        dx = (new_width - self.image_width) // 2
+        dy = (new_height - self.image_height) // 2
+        result = np.empty((self.image_height, self.image_width, 3), dtype=np.uint8)
+        result[:, :, :] = image[0, 0, :]
+        sx0, sy0 = max(dx, 0), max(dy, 0)
+        tx0, ty0 = max(-dx, 0), max(-dy, 0)
+        sx1, sy1 = min(dx + self.image_width, new_width), min(dy + self.image_height, new_height)
+        result[ty0:ty0 + sy1 - sy0, tx0:tx0 + sx1 - sx0, :] = image[sy0:sy1, sx0:sx1, :]
+
+        return result, (new_width / image_width, new_height / image_height, dx, dy)
+
+    def predict_normalized(self, images):
+        """ Raw model output for batch of prepared images scaled to [0, 1]. """
+        return self.session.run(self.output_tensor, feed_dict={self.input_tensor: images})
+
+    def predict(self, images):
+        """ Keypoints (N, 7, 2) in pixel coordinates of given BGR images of any size. """
+        start = time.perf_counter()
+        keypoints = np.empty((len(images), 7, 2), dtype=np.float32)
+        batch = np.empty((self.batch_size, self.image_height, self.image_width, 3), dtype=np.float32)
+
+        for batch_start in range(0, len(images), self.batch_size):
+            batch_images = images[batch_start:batch_start + self.batch_size]
+            transforms = []
+            for i in range(len(batch_images)):
+                image, transform = self.preprocess(batch_images[i])
+                np.multiply(image, 1.0 / 255.0, out=batch[i], dtype=np.float32)
+                transforms.append(transform)
+
+            batch_start_time = time.perf_counter()
+            predictions = self.predict_normalized(batch[:len(batch_images)])
+            self.batch_times.append(time.perf_counter() - batch_start_time)
+            self.batches_count += 1
+
+            points = predictions.reshape(-1, 7, 2) * (self.image_width, self.image_height)
+            for i in range(len(transforms)):
+                scale_x, scale_y, dx, dy = transforms[i]
+                keypoints[batch_start + i] = (points[i] + (dx, dy)) / (scale_x, scale_y)
+
+        self.images_count += len(images)
+        self.total_time += time.perf_counter() - start
+        return keypoints
+
+    def get_stats(self):
+        """ Model run latency per recent batch and overall throughput including preprocessing. """
+        if not self.batch_times:
+            return {}
+        p50, p99 = np.percentile(self.batch_times, [50, 99]) * 1000.0
+        return {"batches": self.batches_count,
+                "batch_p50_ms": p50,
+                "batch_p99_ms": p99,
+                "images_per_second": self.images_count / self.total_time if self.total_time > 0 else 0.0}
+
+    def close(self):
+        self.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run frozen graph on all images of folder and report latency")
+    parser.add_argument("model_file")
+    parser.add_argument("images_folder")
+    parser.add_argument("--images_extension", default=".png")
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--width", type=int, default=299)
+    parser.add_argument("--height", type=int, default=299)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = [cv2.imread(os.path.join(args.images_folder, image_file))
+              for image_file in sorted(os.listdir(args.images_folder))
+              if image_file.endswith(args.images_extension)]
+
+    runtime = FrozenGraphRuntime(args.model_file, batch_size=args.batch_size,
+                                 image_width=args.width, image_height=args.height)
+    for _ in range(args.repeat):
+        runtime.predict(images)
+    print(runtime.get_stats())
+    runtime.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import ctypes
+import multiprocessing
+import os
+import threading
+
+
+class ImageCache(object):
+    """
+    LRU cache of decoded images and parsed labels bounded by total size of images in bytes.
+    Cache filled before worker processes are started is shared with them copy-on-write,
+    hit/miss/eviction counters are shared between all processes.
+    Only process which created cache inserts into it: copy in worker is read-only, otherwise every worker
+    would grow its private copy and memory could reach max_bytes per process.
+    So with workers, preload (DataLoader.preload) is what gets cached, and items/bytes stats are exact.
+    """
+
+    HITS = 0
+    MISSES = 1
+    EVICTIONS = 2
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = multiprocessing.Array(ctypes.c_int64, 3)
+        self.owner_pid = os.getpid()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None:
+                self.items.move_to_end(key)
+        self.count(ImageCache.HITS if item is not None else ImageCache.MISSES)
+        return item
+
+    def put(self, key, image, labels):
+        size = image.nbytes
+        if size > self.max_bytes or os.getpid() != self.owner_pid:
+            return
+
+        evicted = 0
+        with self.lock:
+            if key in self.items:
+                return
+            while self.bytes + size > self.max_bytes:
+                _, (old_image, _) = self.items.popitem(last=False)
+                self.bytes -= old_image.nbytes
+                evicted += 1
+            self.items[key] = (image, labels)
+            self.bytes += size
+
+        if evicted > 0:
+            self.count(ImageCache.EVICTIONS, evicted)
+
+    def count(self, counter, value=1):
+        with self.counters.get_lock():
+            self.counters[counter] += value
+
+    def get_stats(self):
+        return {"hits": self.counters[ImageCache.HITS],
+                "misses": self.counters[ImageCache.MISSES],
+                "evictions": self.counters[ImageCache.EVICTIONS],
+                "items": len(self.items),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
@@ -0,0 +1,210 @@
+from FrozenGraphRuntime import FrozenGraphRuntime
+import argparse
+from collections import deque
+from concurrent.futures import CancelledError, Future
+import cv2
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import numpy as np
+import queue
+from socketserver import ThreadingMixIn
+import threading
+import time
+
+
+class MicroBatcher(object):
+    """
+    Collects concurrent single image requests into batches for one model runtime.
+    Batch is run when it is full or when its first request has waited max_latency_ms.
+    Latency percentiles are taken over last stats_window requests, counts are totals.
+    """
+
+    def __init__(self, runtime, max_batch_size=16, max_latency_ms=5.0, stats_window=10000):
+        self.runtime = runtime
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.requests = queue.Queue()
+        self.stop_event = threading.Event()
+        self.submit_lock = threading.Lock()
+
+        self.requests_count = 0
+        self.batches_count = 0
+        self.latencies = deque(maxlen=stats_window)
+        self.stats_lock = threading.Lock()
+
+        self.worker = threading.Thread(target=self.run, name="MicroBatcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, image):
+        """ Returns Future with (7, 2) keypoints of image in its pixel coordinates, cancelled if batcher is closed. """
+        future = Future()
+        with self.submit_lock:
+            if self.stop_event.is_set():
+                future.cancel()
+            else:
+                self.requests.put((image, future, time.perf_counter()))
+        return future
+
+    def predict(self, image):
+        return self.submit(image).result()
+
+    def collect_batch(self):
+        try:
+            first = self.requests.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = first[2] + self.max_latency
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while not self.stop_event.is_set():
+            batch = self.collect_batch()
+            if not batch:
+                continue
+
+            try:
+                keypoints = self.runtime.predict([image for image, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            finish = time.perf_counter()
+            for (_, future, _), item_keypoints in zip(batch, keypoints):
+                future.set_result(item_keypoints)
+
+            with self.stats_lock:
+                self.requests_count += len(batch)
+                self.batches_count += 1
+                self.latencies.extend(finish - start for _, _, start in batch)
+
+    def close(self):
+        with self.submit_lock:
+            self.stop_event.set()
+        self.worker.join()
+        while True:
+            try:
+                _, future, _ = self.requests.get_nowait()
+                future.cancel()
+            except queue.Empty:
+                break
+
+    def get_stats(self):
+        """ Request latency (queueing + batch run) and mean size of batches actually run. """
+        with self.stats_lock:
+            if not self.latencies:
+                return {"requests": 0}
+            p50, p99 = np.percentile(self.latencies, [50, 99]) * 1000.0
+            return {"requests": self.requests_count,
+                    "batches": self.batches_count,
+                    "mean_batch_size": self.requests_count / self.batches_count,
+                    "latency_p50_ms": p50,
+                    "latency_p99_ms": p99}
+
+
+class KeypointRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /predict with encoded image (png, jpeg, ...) as body returns {"keypoints": [[x, y], ...]},
+    GET /stats returns batcher statistics.
+    """
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self.send_error(404)
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = 0
+        if length <= 0:
+            self.send_error(400, "image is expected as request body")
+            return
+
+        data = self.rfile.read(length)
+        try:
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        except cv2.error:
+            image = None
+        if image is None:
+            self.send_error(400, "could not decode image")
+            return
+
+        try:
+            keypoints = self.server.batcher.predict(image)
+        except CancelledError:
+            self.send_error(503, "server is shutting down")
+            return
+        except Exception as e:
+            self.send_error(500, "prediction failed: {}".format(type(e).__name__))
+            return
+        self.send_json({"keypoints": keypoints.tolist()})
+
+    def do_GET(self):
+        if self.path != "/stats":
+            self.send_error(404)
+            return
+        self.send_json(self.server.batcher.get_stats())
+
+    def send_json(self, value):
+        body = json.dumps(value).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per frame is too much
+
+
+class KeypointServer(ThreadingMixIn, HTTPServer):
+    """
+    Localhost HTTP server sharing one warmed-up frozen graph between clients, request per thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, batcher):
+        HTTPServer.__init__(self, address, KeypointRequestHandler)
+        self.batcher = batcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve keypoints predictions of frozen graph over localhost HTTP")
+    parser.add_argument("model_file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max_batch_size", type=int, default=16)
+    parser.add_argument("--max_latency_ms", type=float, default=5.0)
+    parser.add_argument("--width", type=int, default=299)
+    parser.add_argument("--height", type=int, default=299)
+    args = parser.parse_args()
+
+    runtime = FrozenGraphRuntime(args.model_file, batch_size=args.max_batch_size,
+                                 image_width=args.width, image_height=args.height)
+    batcher = MicroBatcher(runtime, max_batch_size=args.max_batch_size, max_latency_ms=args.max_latency_ms)
+    server = KeypointServer((args.host, args.port), batcher)
+
+    print("serving on http://{}:{}/predict".format(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        runtime.close()
+        print(batcher.get_stats())
+
+
+if __name__ == "__main__":
+    main()
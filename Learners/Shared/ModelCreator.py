@@ -1,21 +1,26 @@
-from keras import activations
-from keras import applications
-from keras import metrics
-from keras import optimizers
-from keras import backend as K
-from keras.layers import Dropout, Flatten, Dense
-from keras.models import load_model
-from keras.models import Model
-import tensorflow as tf
-from tensorflow.python.framework import graph_io
-from tensorflow.python.framework import graph_util
+import numpy as np
 import os
+import time
+import typing
+
+# Keras and TensorFlow are imported by methods on first use, so architectures registry is cheap to import
+if typing.TYPE_CHECKING:
+    from keras.models import Model
 
 
 def euclidean_distance_loss(y_true, y_pred):
+    from keras import backend as K
     return K.sqrt(K.sum(K.square(y_true - y_pred), axis=-1, keepdims=True))
 
 
+def application(name, **kwargs):
+    """ Creator of keras.applications model with given extra arguments (e.g. alpha). """
+    def create(**create_kwargs):
+        from keras import applications
+        return getattr(applications, name)(**kwargs, **create_kwargs)
+    return create
+
+
 class ModelCreator(object):
     def __init__(self, image_width=299, image_height=299, nb_labels=14):
         self.imageWidth = image_width
@@ -23,21 +28,56 @@ class ModelCreator(object):
         self.nb_labels = nb_labels
         self.base_model_name = ""
         self.layers_to_unfreeze = 0
+        self.base_layers_count = 0
         self.loss_function = euclidean_distance_loss
+        self.metrics = ["mean_absolute_error"]
+
+    VGG16 = ("VGG16", application("VGG16"), 11)
+    VGG19 = ("VGG19", application("VGG19"), 12)
+    ResNet50 = ("ResNet50", application("ResNet50"), 154)
+    InceptionV3 = ("InceptionV3", application("InceptionV3"), 249)
+    Xception = ("Xception", application("Xception"), 106)
+
+    # Mobile backbones with width multiplier (alpha), unfreeze point is layer name, the same for all widths
+    MobileNet_100 = ("MobileNet_100", application("MobileNet", alpha=1.0), "conv_pad_12")
+    MobileNet_075 = ("MobileNet_075", application("MobileNet", alpha=0.75), "conv_pad_12")
+    MobileNet_050 = ("MobileNet_050", application("MobileNet", alpha=0.5), "conv_pad_12")
+    MobileNet_025 = ("MobileNet_025", application("MobileNet", alpha=0.25), "conv_pad_12")
+    MobileNetV2_100 = ("MobileNetV2_100", application("MobileNetV2", alpha=1.0), "block_15_expand")
+    MobileNetV2_075 = ("MobileNetV2_075", application("MobileNetV2", alpha=0.75), "block_15_expand")
+    MobileNetV2_050 = ("MobileNetV2_050", application("MobileNetV2", alpha=0.5), "block_15_expand")
+    MobileNetV2_035 = ("MobileNetV2_035", application("MobileNetV2", alpha=0.35), "block_15_expand")
 
-    VGG16 = ("VGG16", applications.VGG16, 11)
-    VGG19 = ("VGG19", applications.VGG19, 12)
-    ResNet50 = ("ResNet50", applications.ResNet50, 154)
-    InceptionV3 = ("InceptionV3", applications.InceptionV3, 249)
-    Xception = ("Xception", applications.Xception, 106)
+    ARCHITECTURES = [VGG16, VGG19, ResNet50, InceptionV3, Xception,
+                     MobileNet_100, MobileNet_075, MobileNet_050, MobileNet_025,
+                     MobileNetV2_100, MobileNetV2_075, MobileNetV2_050, MobileNetV2_035]
+
+    # Heads between backbone features and dense layers: flatten keeps spatial layout, but is huge on large backbones
+    HEADS = {"flatten": "Flatten", "avg": "GlobalAveragePooling2D", "max": "GlobalMaxPooling2D"}
+    HEAD_LAYERS_COUNT = 4  # flatten or pooling and 3 dense layers
+
+    # Inference graph transforms (tensorflow.tools.graph_transforms), input and output nodes are always kept
+    OPTIMIZE_TRANSFORMS = ["strip_unused_nodes",
+                           "remove_nodes(op=Identity, op=CheckNumerics)",
+                           "fold_constants(ignore_errors=true)",
+                           "fold_batch_norms",
+                           "fold_old_batch_norms",
+                           "sort_by_execution_order"]
+    QUANTIZE_TRANSFORMS = OPTIMIZE_TRANSFORMS + ["quantize_weights"]
+
+    def get_model(self, architecture, weights_file_name=None, loss_function=euclidean_distance_loss,
+                  head="flatten", head_width=1024, base_weights="imagenet"):
+        from keras import activations, layers, optimizers
+        from keras.layers import Dense
+        from keras.models import Model
 
-    def get_model(self, architecture, weights_file_name=None, loss_function=euclidean_distance_loss):
         self.base_model_name, base_model_creator, self.layers_to_unfreeze = architecture
         self.loss_function = loss_function
 
-        base_model = base_model_creator(weights="imagenet" if weights_file_name is None else None,
+        base_model = base_model_creator(weights=base_weights if weights_file_name is None else None,
                                         include_top=False,
                                         input_shape=(self.imageWidth, self.imageHeight, 3))
+        self.base_layers_count = len(base_model.layers)
 
         """ Print base model layers' indexes and names
         for li in range(len(base_model.layers)):
@@ -50,25 +90,28 @@ class ModelCreator(object):
 
         # Adding custom Layers
         x = base_model.output
-        x = Flatten()(x)
-        x = Dense(1024, activation=activations.relu)(x)
+        x = getattr(layers, ModelCreator.HEADS[head])()(x)
+        x = Dense(head_width, activation=activations.relu)(x)
         # x = Dropout(0.5)(x)
-        x = Dense(1024, activation=activations.relu)(x)
+        x = Dense(head_width, activation=activations.relu)(x)
         predictions = Dense(self.nb_labels, activation=activations.linear)(x)
 
         # creating the final model
         final_model = Model(inputs=base_model.input, outputs=predictions)
+        self.layers_to_unfreeze = ModelCreator.get_layer_index(final_model, self.layers_to_unfreeze)
         if weights_file_name is not None:
             final_model.load_weights(weights_file_name)
 
         # compile the model
         final_model.compile(loss=self.loss_function,
                             optimizer=optimizers.SGD(lr=0.001, momentum=0.9),
-                            metrics=[metrics.mean_absolute_error])
+                            metrics=self.metrics)
 
         return final_model
 
-    def unfreeze_top(self, model: Model, from_level=-1, new_lr=0.001):
+    def unfreeze_top(self, model: "Model", from_level=-1, new_lr=0.001):
+        from keras import optimizers
+
         if from_level < 0:
             from_level = self.layers_to_unfreeze
 
@@ -80,30 +123,69 @@ class ModelCreator(object):
         # recompile the model
         model.compile(loss=self.loss_function,
                       optimizer=optimizers.SGD(lr=new_lr, momentum=0.9),
-                      metrics=[metrics.mean_absolute_error])
+                      metrics=self.metrics)
+
+    def get_backbone_model(self, model: "Model"):
+        """ Base part of model, its output are features for head. """
+        from keras.models import Model
+        return Model(inputs=model.input, outputs=model.layers[self.base_layers_count - 1].output)
+
+    def get_head_model(self, model: "Model", lr=0.001):
+        """
+        Custom layers of model on backbone features input, for training on cached features while base is frozen.
+        Layers are shared with model, so trained weights are already in model.
+        """
+        from keras import backend as K, optimizers
+        from keras.layers import Input
+        from keras.models import Model
+
+        features = Input(shape=K.int_shape(model.layers[self.base_layers_count - 1].output)[1:])
+        x = features
+        for layer in model.layers[self.base_layers_count:]:
+            x = layer(x)
+        head_model = Model(inputs=features, outputs=x)
+
+        head_model.compile(loss=self.loss_function,
+                           optimizer=optimizers.SGD(lr=lr, momentum=0.9),
+                           metrics=self.metrics)
+        return head_model
 
     def load(self, file_name):
+        from keras.models import load_model
+
         base_model_def = None
-        for model_def in [ModelCreator.VGG16,
-                          ModelCreator.VGG19,
-                          ModelCreator.ResNet50,
-                          ModelCreator.InceptionV3,
-                          ModelCreator.Xception]:
+        # longest names first, so "MobileNetV2_050" is not taken for "MobileNet..."
+        for model_def in sorted(ModelCreator.ARCHITECTURES, key=lambda model_def: len(model_def[0]), reverse=True):
             if model_def[0] in file_name:
                 base_model_def = model_def
                 break
         if base_model_def is not None:
             self.base_model_name, _, self.layers_to_unfreeze = base_model_def
 
-        return load_model(file_name)
+        model = load_model(file_name)
+        self.base_layers_count = len(model.layers) - ModelCreator.HEAD_LAYERS_COUNT
+        self.layers_to_unfreeze = ModelCreator.get_layer_index(model, self.layers_to_unfreeze)
+        return model
 
     @staticmethod
-    def save(model: Model, file_name):
+    def get_layer_index(model: "Model", layer):
+        """ Index of layer given by index or name. """
+        if isinstance(layer, str):
+            return [model_layer.name for model_layer in model.layers].index(layer)
+        return layer
+
+    @staticmethod
+    def save(model: "Model", file_name):
         model.save(file_name)
         print("saved keras model at: ", file_name)
 
     @staticmethod
-    def save_tf(model: Model, folder, file_name_only, num_output=1):
+    def save_tf(model: "Model", folder, file_name_only, num_output=1):
+        from keras import backend as K
+        import tensorflow as tf
+        from tensorflow.python.framework import graph_io
+        from tensorflow.python.framework import graph_util
+
         K.set_learning_phase(0)
         K.set_image_data_format("channels_last")
 
@@ -118,3 +200,102 @@ class ModelCreator(object):
         constant_graph = graph_util.convert_variables_to_constants(sess, sess.graph.as_graph_def(), pred_node_names)
         graph_io.write_graph(constant_graph, folder, file_name_only, as_text=False)
         print("saved frozen graph (ready for inference) at: ", os.path.join(folder, file_name_only))
+
+    @staticmethod
+    def freeze_inference_graph(model: "Model", num_output=1, transforms=None):
+        """
+        Rebuilds model in separate graph in test phase, so dropout and batch normalization have no training branches,
+        converts variables to constants and applies given graph transforms.
+        """
+        from keras import backend as K
+        from keras.models import Model
+        import tensorflow as tf
+        from tensorflow.python.framework import graph_util
+
+        config = model.get_config()
+        weights = model.get_weights()
+        training_session = K.get_session()
+
+        graph = tf.Graph()
+        with graph.as_default():
+            sess = tf.Session(graph=graph)
+            K.set_session(sess)
+            try:
+                K.set_learning_phase(0)
+                inference_model = Model.from_config(config)
+                inference_model.set_weights(weights)
+
+                pred_node_names = ["output_" + str(i + 1) for i in range(num_output)]
+                for i in range(num_output):
+                    tf.identity(inference_model.outputs[i], name=pred_node_names[i])
+                input_node_names = [node.op.name for node in inference_model.inputs]
+
+                constant_graph = graph_util.convert_variables_to_constants(sess, graph.as_graph_def(),
+                                                                           pred_node_names)
+            finally:
+                K.set_session(training_session)
+                sess.close()
+
+        if transforms:
+            from tensorflow.tools.graph_transforms import TransformGraph
+            constant_graph = TransformGraph(constant_graph, input_node_names, pred_node_names, transforms)
+        return constant_graph
+
+    @staticmethod
+    def export_tf(model: "Model", folder, name, images, quantize=True, accuracy_tolerance=1.0, runs=20):
+        """
+        Saves frozen, optimized and (optionally) weights-quantized inference graphs as name[_variant].pb
+        and measures each on fixed batch of images: file size, load time, CPU latency
+        and max keypoint deviation (pixels) from Keras model predictions.
+        Returns measurements and file of the fastest variant within accuracy tolerance.
+        """
+        import CubeMetrics
+        from FrozenGraphRuntime import FrozenGraphRuntime
+        from tensorflow.python.framework import graph_io
+
+        variants = [("frozen", None), ("optimized", ModelCreator.OPTIMIZE_TRANSFORMS)]
+        if quantize:
+            variants.append(("quantized", ModelCreator.QUANTIZE_TRANSFORMS))
+
+        image_height, image_width = images.shape[1:3]
+        reference = model.predict(images)
+
+        results = []
+        for variant, transforms in variants:
+            file_name_only = name + ".pb" if variant == "frozen" else name + "_" + variant + ".pb"
+            graph_io.write_graph(ModelCreator.freeze_inference_graph(model, transforms=transforms),
+                                 folder, file_name_only, as_text=False)
+            file_name = os.path.join(folder, file_name_only)
+
+            start = time.perf_counter()
+            runtime = FrozenGraphRuntime(file_name, batch_size=len(images),
+                                         image_width=image_width, image_height=image_height, use_gpu=False)
+            load_time = time.perf_counter() - start
+
+            latencies = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                predictions = runtime.predict_normalized(images)
+                latencies.append(time.perf_counter() - start)
+            runtime.close()
+
+            deviation = CubeMetrics.point_errors(reference, predictions, (image_width, image_height)).max()
+            results.append({"variant": variant,
+                            "file": file_name,
+                            "size_mb": os.path.getsize(file_name) / 1024 ** 2,
+                            "load_ms": load_time * 1000.0,
+                            "latency_ms": np.median(latencies) * 1000.0,
+                            "max_deviation_px": deviation})
+
+        accurate = [result for result in results if result["max_deviation_px"] <= accuracy_tolerance]
+        best = min(accurate, key=lambda result: result["latency_ms"])["file"] if accurate else None
+
+        print("{:<12}{:>10}{:>10}{:>12}{:>16}".format("variant", "size_mb", "load_ms", "latency_ms",
+                                                      "deviation_px"))
+        for result in results:
+            print("{:<12}{:>10.1f}{:>10.0f}{:>12.2f}{:>16.4f}".format(
+                result["variant"], result["size_mb"], result["load_ms"], result["latency_ms"],
+                result["max_deviation_px"]))
+        print("fastest graph within {} px: {}".format(accuracy_tolerance, best))
+
+        return results, best
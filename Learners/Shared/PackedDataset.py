@@ -0,0 +1,192 @@
+from DataLoader import DataLoader
+import argparse
+import cv2
+import json
+import numpy as np
+import os
+
+MAGIC = b"RUBIKPCK"
+ALIGNMENT = 4096
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def get_arrays_offsets(header_length, header):
+    images_offset = align(len(MAGIC) + 8 + header_length)
+    image_size = int(np.prod(header["image_shape"])) * np.dtype(header.get("image_dtype", "uint8")).itemsize
+    labels_offset = align(images_offset + header["count"] * image_size)
+    return images_offset, labels_offset
+
+
+def open_packed_arrays(file_name, header_length, header, mode):
+    images_offset, labels_offset = get_arrays_offsets(header_length, header)
+    images = np.memmap(file_name, dtype=header.get("image_dtype", "uint8"), mode=mode, offset=images_offset,
+                       shape=(header["count"],) + tuple(header["image_shape"]))
+    labels = np.memmap(file_name, dtype=np.float32, mode=mode, offset=labels_offset,
+                       shape=(header["count"],) + tuple(header["label_shape"]))
+    return images, labels
+
+
+def write_packed_file(file_name, names, image_shape, label_shape, count=None, extra=None, image_dtype=np.uint8):
+    """
+    Creates packed file and returns writable memory maps of its images and labels.
+    File layout: magic, header length, JSON header, then aligned images (uint8 by default) and float32 labels arrays.
+    By default there is one item per name, extra values are added to header as they are.
+    """
+    header = dict(extra or {})
+    if np.dtype(image_dtype) != np.uint8:
+        header["image_dtype"] = np.dtype(image_dtype).name
+    header.update({"count": len(names) if count is None else count,
+                   "image_shape": list(image_shape),
+                   "label_shape": list(label_shape),
+                   "names": names})
+    header_bytes = json.dumps(header).encode("utf-8")
+    _, labels_offset = get_arrays_offsets(len(header_bytes), header)
+
+    with open(file_name, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        f.truncate(labels_offset + header["count"] * int(np.prod(label_shape)) * 4)
+
+    return open_packed_arrays(file_name, len(header_bytes), header, "r+")
+
+
+def read_packed_file(file_name):
+    with open(file_name, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a packed dataset file: " + file_name)
+        header_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(header_length).decode("utf-8"))
+
+    images, labels = open_packed_arrays(file_name, header_length, header, "r")
+    return header, images, labels
+
+
+def get_working_size(image_height, image_width, working_width, working_height):
+    """ Size of whole image scaled by its short side to cover working size, so nothing has to be cropped. """
+    scale = max(working_height / image_height, working_width / image_width)
+    return max(int(image_height * scale + 0.5), working_height), max(int(image_width * scale + 0.5), working_width)
+
+
+def resize_to_working_size(image, labels, working_width, working_height):
+    """
+    Scales whole image to cover working size keeping aspect (same scale as not augmented DataGenerator uses
+    for target size), image is not cropped, so labels stay where they were relative to image content.
+    """
+    image_height = image.shape[0]
+    image_width = image.shape[1]
+
+    new_height, new_width = get_working_size(image_height, image_width, working_width, working_height)
+    if new_height != image_height or new_width != image_width:
+        image = cv2.resize(image, (new_width, new_height))
+
+    labels = labels * (new_width / image_width, new_height / image_height)
+    return image, labels
+
+
+def pack_folder(images_folder, labels_folder, output_file, working_width, working_height,
+                images_extension=".png", labels_extension=".bounds"):
+    """
+    Packs whole images at working scale into slots of the largest scaled image size,
+    extents of each image are kept in header and smaller images are zero padded.
+    """
+    loader = DataLoader(images_folder, labels_folder, images_extension, labels_extension)
+    names = sorted(loader.get_image_file_names())
+    if not names:
+        raise ValueError("No labeled images found in " + images_folder)
+
+    # slot size has to be known before file is created, packing is done once so images are decoded twice
+    extents = []
+    for name in names:
+        image_shape = DataLoader.read_image(os.path.join(images_folder, name)).shape
+        extents.append(get_working_size(image_shape[0], image_shape[1], working_width, working_height))
+    slot_height = max(height for height, _ in extents)
+    slot_width = max(width for _, width in extents)
+
+    _, first_labels = loader.load_image_and_labels(names[0])
+    label_shape = (len(first_labels), 2)
+
+    images, labels = write_packed_file(output_file, names, (slot_height, slot_width, 3), label_shape,
+                                       extra={"extents": extents})
+    outside = []
+    for i in range(len(names)):
+        image, image_labels = loader.load_image_and_labels(names[i])
+        if len(image_labels) != label_shape[0]:
+            raise ValueError("Expected {} labels in {}, found {}".format(label_shape[0], names[i], len(image_labels)))
+
+        image, image_labels = resize_to_working_size(image, image_labels, working_width, working_height)
+        height, width = image.shape[:2]
+        images[i, :height, :width] = image
+        labels[i] = image_labels
+        if np.any(image_labels < 0) or np.any(image_labels >= (width, height)):
+            outside.append(names[i])
+
+    if outside:
+        print("labels outside of image in {} of {} images: {}".format(len(outside), len(names),
+                                                                       ", ".join(outside[:10])))
+
+    images.flush()
+    labels.flush()
+    return len(names)
+
+
+class PackedDataLoader(object):
+    """
+    DataLoader backed by single packed file: images are zero-copy slices of memory map,
+    cut to their own extents when images of different sizes were packed.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.open()
+
+    def open(self):
+        header, self.images, self.labels = read_packed_file(self.file_name)
+        self.names = header["names"]
+        self.indexes = {self.names[i]: i for i in range(len(self.names))}
+        self.extents = header.get("extents")
+
+    def get_image_file_names(self):
+        return list(self.names)
+
+    def load_image_and_labels(self, image_file_name):
+        index = self.indexes[image_file_name]
+        if self.extents is None:
+            return self.images[index], np.array(self.labels[index])
+        height, width = self.extents[index]
+        return self.images[index, :height, :width], np.array(self.labels[index])
+
+    def __getstate__(self):
+        # Memory maps are reopened in other processes instead of being pickled with their data
+        return {"file_name": self.file_name}
+
+    def __setstate__(self, state):
+        self.file_name = state["file_name"]
+        self.open()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack images and labels folder into single memory-mapped file")
+    parser.add_argument("images_folder")
+    parser.add_argument("labels_folder")
+    parser.add_argument("output_file")
+    parser.add_argument("--target_width", type=int, default=299)
+    parser.add_argument("--target_height", type=int, default=299)
+    parser.add_argument("--scale", type=float, default=1.25,
+                        help="working size relative to target size, headroom for random scale and crop")
+    parser.add_argument("--images_extension", default=".png")
+    parser.add_argument("--labels_extension", default=".bounds")
+    args = parser.parse_args()
+
+    count = pack_folder(args.images_folder, args.labels_folder, args.output_file,
+                        int(args.target_width * args.scale + 0.5), int(args.target_height * args.scale + 0.5),
+                        images_extension=args.images_extension, labels_extension=args.labels_extension)
+    print("packed {} images into {} ({:.1f} MB)".format(count, args.output_file,
+                                                        os.path.getsize(args.output_file) / 1024.0 ** 2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import queue
+import threading
+import time
+
+
+class PrefetchingGenerator(object):
+    """
+    Endless generator over batches of Sequence, building next batches in background threads
+    into bounded queue while model trains on current one.
+    Batches go in Sequence order, on_epoch_end is called after all batches of epoch are built.
+    Note: with threads > 1 batches are built concurrently, which makes in-process augmentation not reproducible
+    (use DataGenerator workers for parallel and reproducible loading).
+    """
+
+    def __init__(self, sequence, queue_size=8, threads=1):
+        self.sequence = sequence
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.stop_event = threading.Event()
+
+        self.batches = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.empty_queue_batches = 0
+        self.queue_depth_total = 0
+        self.start_time = None
+
+        self.dispatcher = threading.Thread(target=self.dispatch, name="PrefetchingGenerator", daemon=True)
+        self.dispatcher.start()
+
+    def dispatch(self):
+        try:
+            while not self.stop_event.is_set():
+                epoch_futures = []
+                for idx in range(len(self.sequence)):
+                    future = self.executor.submit(self.sequence.__getitem__, idx)
+                    epoch_futures.append(future)
+                    if not self.put(future):
+                        return
+                wait(epoch_futures)
+                self.sequence.on_epoch_end()
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.stop_event.is_set():
+            raise StopIteration
+
+        queue_depth = self.queue.qsize()
+        start = time.perf_counter()
+        try:
+            item = self.queue.get()
+            if isinstance(item, Exception):
+                raise item
+            batch = item.result()
+        except BaseException:  # including KeyboardInterrupt
+            self.close()
+            raise
+        wait_time = time.perf_counter() - start
+
+        if self.start_time is None:
+            self.start_time = start
+        self.batches += 1
+        self.wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.queue_depth_total += queue_depth
+        if queue_depth == 0:
+            self.empty_queue_batches += 1
+
+        return batch
+
+    next = __next__
+
+    def close(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        while True:  # unblock dispatcher and drop prepared batches
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.dispatcher.join()
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_stats(self):
+        """ High wait ratio and share of batches taken from empty queue mean training is input-bound. """
+        total_time = time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+        batches = max(self.batches, 1)
+        return {"batches": self.batches,
+                "mean_queue_depth": self.queue_depth_total / batches,
+                "empty_queue_batches": self.empty_queue_batches,
+                "mean_wait_ms": self.wait_time / batches * 1000.0,
+                "max_wait_ms": self.max_wait_time * 1000.0,
+                "wait_ratio": self.wait_time / total_time if total_time > 0 else 0.0}
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+
+class ReadaheadLoader(object):
+    """
+    Wraps DataLoader to read and decode files of upcoming items concurrently in thread pool.
+    Items requested with prefetch are loaded in background, later load_image_and_labels takes ready result.
+    """
+
+    def __init__(self, loader, threads=8, max_pending=1024):
+        self.loader = loader
+        self.threads = threads
+        self.max_pending = max_pending
+        self.executor = None
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        return self.executor
+
+    def get_image_file_names(self):
+        return self.loader.get_image_file_names()
+
+    @property
+    def timer(self):
+        return self.loader.timer
+
+    @timer.setter
+    def timer(self, timer):
+        self.loader.timer = timer
+
+    def prefetch(self, image_file_names):
+        with self.lock:
+            for image_file_name in image_file_names:
+                if image_file_name not in self.pending:
+                    self.pending[image_file_name] = \
+                        self.get_executor().submit(self.loader.load_image_and_labels, image_file_name)
+            while len(self.pending) > self.max_pending:  # forget items which were never requested
+                self.pending.popitem(last=False)
+
+    def load_image_and_labels(self, image_file_name):
+        with self.lock:
+            future = self.pending.pop(image_file_name, None)
+        if future is None:
+            return self.loader.load_image_and_labels(image_file_name)
+        return future.result()
+
+    def preload(self, image_file_names):
+        self.loader.preload(image_file_names)
+
+    def get_cache_stats(self):
+        return self.loader.get_cache_stats()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        self.pending.clear()
+
+    def __getstate__(self):
+        # Other processes get plain loader state, without threads and pending reads
+        state = self.__dict__.copy()
+        state["executor"] = None
+        state["pending"] = OrderedDict()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
@@ -1,105 +1,102 @@
-from keras import backend as K
-from keras.utils.generic_utils import get_custom_objects
-
-
-class CubePoints(object):
-    def __init__(self, y):
-        self.points = []
-        self.points.append((y[:, 0], y[:, 1]))
-        self.points.append((y[:, 2], y[:, 3]))
-        self.points.append((y[:, 4], y[:, 5]))
-        self.points.append((y[:, 6], y[:, 7]))
-        self.points.append((y[:, 8], y[:, 9]))
-        self.points.append((y[:, 10], y[:, 11]))
-        self.points.append((y[:, 12], y[:, 13]))
-
-        self.edges = []
-        self.edges.append(self.calc_len(0, 1))
-        self.edges.append(self.calc_len(0, 3))
-        self.edges.append(self.calc_len(0, 5))
-        self.edges.append(self.calc_len(1, 2))
-        self.edges.append(self.calc_len(2, 3))
-        self.edges.append(self.calc_len(3, 4))
-        self.edges.append(self.calc_len(4, 5))
-        self.edges.append(self.calc_len(5, 6))
-        self.edges.append(self.calc_len(6, 1))
-
-    def calc_len(self, point1, point2):
-        x1, y1 = self.points[point1]
-        x2, y2 = self.points[point2]
-        return K.sqrt(K.square(x1 - x2) + K.square(y1 - y2))
+import numpy as np
 
+# Keras is imported inside loss functions, so label helpers below work in tools and workers without it
 
-def cube_loss(y_true, y_pred):
-    cube_true = CubePoints(y_true)
-    cube_pred = CubePoints(y_pred)
 
-    def calc_diff_square(point1, point2):
-        x1, y1 = point1
-        x2, y2 = point2
-        return K.square(x1 - x2) + K.square(y1 - y2)
+# Rubik cube edges as pairs of point indexes (see correct_label_orientation for points layout)
+CUBE_EDGES = [(0, 1), (0, 3), (0, 5), (1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 1)]
+EDGE_STARTS = np.array([a for a, _ in CUBE_EDGES])
+EDGE_ENDS = np.array([b for _, b in CUBE_EDGES])
 
-    l1 = calc_diff_square(cube_true.points[0], cube_pred.points[0])
-    for i in range(1, len(cube_true.points)):
-        l1 = l1 + calc_diff_square(cube_true.points[i], cube_pred.points[i])
-    l1 = K.sqrt(l1)
+# Edges adjacent to every point, used to make point error relative to cube size around it
+POINT_EDGES = [[0, 1, 2], [0, 3, 8], [3, 4], [1, 4, 5], [5, 6], [2, 6, 7], [7, 8]]
+POINT_EDGES_MATRIX = np.array([[1.0 if ei in edges else 0.0 for edges in POINT_EDGES]
+                               for ei in range(len(CUBE_EDGES))], dtype=np.float32)
+POINT_EDGES_COUNT = np.array([len(edges) for edges in POINT_EDGES], dtype=np.float32)
 
-    l2 = K.square(K.sqrt(cube_true.edges[0]) - K.sqrt(cube_pred.edges[0]))
-    for i in range(1, len(cube_true.edges)):
-        l2 = l2 + K.square(K.sqrt(cube_true.edges[i]) - K.sqrt(cube_pred.edges[i]))
-    l2 = K.sqrt(l2)
 
-    l = l1 + l2
-    l = K.reshape(l, (-1, 1))
+def get_cube_points(y):
+    from keras import backend as K
+    return K.reshape(y, (-1, 7, 2))
 
-    return l
 
+def get_cube_edges(points):
+    from keras import backend as K
+    points = K.permute_dimensions(points, (1, 0, 2))  # (7, batch, 2), to gather points by first axis
+    vectors = K.gather(points, EDGE_STARTS) - K.gather(points, EDGE_ENDS)
+    return K.transpose(K.sqrt(K.sum(K.square(vectors), axis=-1)))  # (batch, 9)
 
-def cube_loss2(y_true, y_pred):
-    cube_true = CubePoints(y_true)
-    cube_pred = CubePoints(y_pred)
 
-    def calc_diff_relative(point_index, edge_indexes):
-        total_edge = cube_true.edges[edge_indexes[0]]
-        for ei in range(1, len(edge_indexes)):
-            total_edge = total_edge + cube_true.edges[edge_indexes[ei]]
+def calc_cube_loss(points_true, points_pred, edges_true, edges_pred):
+    from keras import backend as K
+    l1 = K.sqrt(K.sum(K.square(points_true - points_pred), axis=[1, 2]))
+    l2 = K.sqrt(K.sum(K.square(K.sqrt(edges_true) - K.sqrt(edges_pred)), axis=-1))
+    return l1 + l2
+
 
-        x1, y1 = cube_true.points[point_index]
-        x2, y2 = cube_pred.points[point_index]
-        point_diff = K.abs(x1 - x2) + K.abs(y1 - y2)
+def calc_cube_loss2(points_true, points_pred, edges_true, edges_pred):
+    from keras import backend as K
+    points_diff = K.sum(K.abs(points_true - points_pred), axis=-1)
+    points_edges = K.dot(edges_true, K.constant(POINT_EDGES_MATRIX))
+    l1 = K.sqrt(K.sum(points_diff * K.constant(POINT_EDGES_COUNT) / points_edges, axis=-1))
+    l2 = K.sqrt(K.sum(K.abs(edges_true - edges_pred) / edges_true, axis=-1))
+    return l1 + l2
 
-        return point_diff * len(edge_indexes) / total_edge
 
-    l1 = calc_diff_relative(0, [0, 1, 2]) + \
-         calc_diff_relative(1, [0, 3, 8]) + \
-         calc_diff_relative(2, [3, 4]) + \
-         calc_diff_relative(3, [1, 4, 5]) + \
-         calc_diff_relative(4, [5, 6]) + \
-         calc_diff_relative(5, [2, 6, 7]) + \
-         calc_diff_relative(6, [7, 8])
-    l1 = K.sqrt(l1)
+def get_cube_tensors(y_true, y_pred):
+    points_true = get_cube_points(y_true)
+    points_pred = get_cube_points(y_pred)
+    return points_true, points_pred, get_cube_edges(points_true), get_cube_edges(points_pred)
 
-    l2 = K.abs(cube_true.edges[0] - cube_pred.edges[0]) / cube_true.edges[0]
-    for i in range(1, len(cube_true.edges)):
-        l2 = l2 + K.abs(cube_true.edges[i] - cube_pred.edges[i]) / cube_true.edges[i]
-    l2 = K.sqrt(l2)
 
-    l = l1 + l2
-    l = K.reshape(l, (-1, 1))
+def cube_loss(y_true, y_pred):
+    from keras import backend as K
+    l = calc_cube_loss(*get_cube_tensors(y_true, y_pred))
+    return K.reshape(l, (-1, 1))
+
 
-    return l
+def cube_loss2(y_true, y_pred):
+    from keras import backend as K
+    l = calc_cube_loss2(*get_cube_tensors(y_true, y_pred))
+    return K.reshape(l, (-1, 1))
 
 
 def cube_loss3(y_true, y_pred):
-    l1 = cube_loss(y_true, y_pred)
-    l2 = cube_loss2(y_true, y_pred)
-    return l1 + l2 / 40
+    from keras import backend as K
+    cube_tensors = get_cube_tensors(y_true, y_pred)
+    l = calc_cube_loss(*cube_tensors) + calc_cube_loss2(*cube_tensors) / 40
+    return K.reshape(l, (-1, 1))
+
+
+def get_distillation_loss(teacher_weight=0.5, loss=cube_loss3):
+    """
+    Loss for y_true made of ground truth and teacher predictions concatenated, shape (batch, 2 * labels count).
+    """
+    def distillation_loss(y_true, y_pred):
+        from keras import backend as K
+        labels_count = K.int_shape(y_pred)[-1]
+        return (1.0 - teacher_weight) * loss(y_true[:, :labels_count], y_pred) + \
+            teacher_weight * loss(y_true[:, labels_count:], y_pred)
+    return distillation_loss
+
+
+distillation_loss = get_distillation_loss()
+
+
+def ground_truth_cube_loss3(y_true, y_pred):
+    """ cube_loss3 metric on ground truth part of distillation targets. """
+    from keras import backend as K
+    return cube_loss3(y_true[:, :K.int_shape(y_pred)[-1]], y_pred)
 
 
 def register_losses():
+    from keras.utils.generic_utils import get_custom_objects
+
     get_custom_objects().update({"cube_loss": cube_loss})
     get_custom_objects().update({"cube_loss2": cube_loss2})
     get_custom_objects().update({"cube_loss3": cube_loss3})
+    get_custom_objects().update({"distillation_loss": distillation_loss})
+    get_custom_objects().update({"ground_truth_cube_loss3": ground_truth_cube_loss3})
 
 
 def correct_label_orientation(label):
@@ -110,21 +107,40 @@ def correct_label_orientation(label):
     #  2  |  6
     #     1
     # Edges: 0-1, 0-3, 0-5, 1-2, 2-3, 3-4, 4-5, 5-6
-    if label[3][1] > label[1][1] or label[5][1] > label[1][1]:
-        if label[5][1] > label[3][1]:
-            label = rotate_label(label, [(1, 5, 3), (2, 6, 4)])
+    if label[3, 1] > label[1, 1] or label[5, 1] > label[1, 1]:
+        if label[5, 1] > label[3, 1]:
+            label = label[ROTATE_LEFT]
         else:
-            label = rotate_label(label, [(1, 3, 5), (2, 4, 6)])
+            label = label[ROTATE_RIGHT]
     return label
 
 
-def rotate_label(label, groups):
+def correct_labels_orientation(labels):
+    """ Vectorized correct_label_orientation for (N, 7, 2) array of labels. """
+    is_rotated = (labels[:, 3, 1] > labels[:, 1, 1]) | (labels[:, 5, 1] > labels[:, 1, 1])
+    is_left = is_rotated & (labels[:, 5, 1] > labels[:, 3, 1])
+    is_right = is_rotated & ~is_left
+
+    result = labels.copy()
+    result[is_left] = labels[is_left][:, ROTATE_LEFT]
+    result[is_right] = labels[is_right][:, ROTATE_RIGHT]
+    return result
+
+
+def get_rotation_permutation(groups, points_count=7):
+    # Every point of group takes place of the previous one, first point goes to the end
+    permutation = np.arange(points_count)
     for group in groups:
-        ta, tb = label[group[0]]  # use elements to prevent reference-copy arrays
-        for i in range(len(group) - 1):
-            label[group[i]] = label[group[i + 1]]
-        label[group[-1]] = (ta, tb)
-    return label
+        permutation[list(group)] = group[1:] + group[:1]
+    return permutation
+
+
+def rotate_label(label, groups):
+    return label[get_rotation_permutation(groups, len(label))]
+
+
+ROTATE_LEFT = get_rotation_permutation([(1, 5, 3), (2, 6, 4)])
+ROTATE_RIGHT = get_rotation_permutation([(1, 3, 5), (2, 4, 6)])
 
 
 def get_horizontal_flip_pairs():
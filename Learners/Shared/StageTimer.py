@@ -0,0 +1,66 @@
+import numpy as np
+import threading
+import time
+
+
+class StageTimer(object):
+    """
+    Collects durations of named pipeline stages:
+        start = timer.start()
+        ...
+        start = timer.stop("stage", start)
+    Disabled timer records nothing and costs one attribute check per call.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.durations = {}
+
+    def start(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, stage, start):
+        """ Records time since start, returns current time as start of next stage. """
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    def add(self, stage, duration):
+        with self.lock:
+            self.durations.setdefault(stage, []).append(duration)
+
+    def merge(self, durations):
+        """ Adds durations collected by other timer (e.g. in worker process). """
+        if not durations:
+            return
+        with self.lock:
+            for stage, stage_durations in durations.items():
+                self.durations.setdefault(stage, []).extend(stage_durations)
+
+    def pop_durations(self):
+        with self.lock:
+            durations = self.durations
+            self.durations = {}
+        return durations
+
+    @staticmethod
+    def get_summary(durations):
+        """ Count, mean and p50/p99 in milliseconds per stage. """
+        summary = {}
+        for stage, stage_durations in durations.items():
+            values = np.array(stage_durations) * 1000.0
+            summary[stage] = {"count": len(values),
+                              "mean_ms": values.mean(),
+                              "p50_ms": np.percentile(values, 50),
+                              "p99_ms": np.percentile(values, 99)}
+        return summary
+
+    def __getstate__(self):
+        # Worker processes get empty timer and send their durations back with results
+        return {"enabled": self.enabled}
+
+    def __setstate__(self, state):
+        self.__init__(state["enabled"])
@@ -0,0 +1,75 @@
+from keras.callbacks import Callback
+import numpy as np
+import tensorflow as tf
+import time
+
+
+class StageTimerCallback(Callback):
+    """
+    Writes per epoch histograms of pipeline stages durations collected by StageTimer,
+    share of time spent waiting for data versus model compute, and batches per second
+    into TensorBoard log folder.
+    """
+
+    def __init__(self, timer, log_dir):
+        super(StageTimerCallback, self).__init__()
+        self.timer = timer
+        self.log_dir = log_dir
+        self.writer = None
+        self.wait_time = 0.0
+        self.compute_time = 0.0
+        self.batches = 0
+        self.batch_start = None
+        self.batch_end = None
+
+    def on_train_begin(self, logs=None):
+        if self.writer is None:
+            self.writer = tf.summary.FileWriter(self.log_dir)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.wait_time = 0.0
+        self.compute_time = 0.0
+        self.batches = 0
+        self.batch_end = time.perf_counter()
+
+    def on_batch_begin(self, batch, logs=None):
+        # batch is taken from generator right before this call, so the gap since previous batch is data wait
+        self.batch_start = time.perf_counter()
+        self.wait_time += self.batch_start - self.batch_end
+
+    def on_batch_end(self, batch, logs=None):
+        self.batch_end = time.perf_counter()
+        self.compute_time += self.batch_end - self.batch_start
+        self.batches += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        total_time = self.wait_time + self.compute_time
+        values = [tf.Summary.Value(tag="pipeline/data_wait_ratio",
+                                   simple_value=self.wait_time / total_time if total_time > 0 else 0.0),
+                  tf.Summary.Value(tag="pipeline/batches_per_second",
+                                   simple_value=self.batches / total_time if total_time > 0 else 0.0)]
+
+        for stage, durations in self.timer.pop_durations().items():
+            durations_ms = np.array(durations) * 1000.0
+            values.append(tf.Summary.Value(tag="pipeline/" + stage + "_ms",
+                                           histo=StageTimerCallback.get_histogram(durations_ms)))
+            values.append(tf.Summary.Value(tag="pipeline/" + stage + "_mean_ms",
+                                           simple_value=durations_ms.mean()))
+
+        self.writer.add_summary(tf.Summary(value=values), epoch)
+        self.writer.flush()
+        print("data wait ratio: {:.2f}, batches per second: {:.2f}".format(values[0].simple_value,
+                                                                          values[1].simple_value))
+
+    def on_train_end(self, logs=None):
+        self.writer.close()
+        self.writer = None
+
+    @staticmethod
+    def get_histogram(values, bins=30):
+        counts, edges = np.histogram(values, bins=bins)
+        histogram = tf.HistogramProto(min=float(values.min()), max=float(values.max()), num=len(values),
+                                      sum=float(values.sum()), sum_squares=float(np.square(values).sum()))
+        histogram.bucket_limit.extend(edges[1:].tolist())
+        histogram.bucket.extend(counts.tolist())
+        return histogram
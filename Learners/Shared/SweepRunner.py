@@ -0,0 +1,117 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+
+# Thread pools of native libraries (numpy BLAS, TensorFlow) are sized by these when library is loaded,
+# so they are set in environment of worker interpreter before it starts and imports anything
+THREAD_VARIABLES = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]
+
+
+def expand_grid(grid):
+    """ All combinations of grid values, e.g. {"lr": [0.01, 0.001], "batch_size": [16, 32]} gives 4 configs. """
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*[grid[key] for key in keys])]
+
+
+def get_available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(multiprocessing.cpu_count()))
+
+
+def split_cores(cores, parallel_runs):
+    """ Disjoint equal sets of cores, one per parallel run. """
+    per_run = max(1, len(cores) // parallel_runs)
+    return [cores[i * per_run:(i + 1) * per_run] for i in range(min(parallel_runs, len(cores)))]
+
+
+def start_with_thread_limit(process, threads):
+    """ Starts spawned process with thread variables set to given count, parent environment is restored after. """
+    saved = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+    os.environ.update({variable: str(threads) for variable in THREAD_VARIABLES})
+    try:
+        process.start()
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                del os.environ[variable]
+            else:
+                os.environ[variable] = value
+
+
+def run_config(function, index, config, cores, results):
+    """ Worker process: pins itself to given cores and runs function on config. """
+    start = time.time()
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+
+        result, error = function(config, len(cores)), None
+    except Exception:
+        result, error = {}, traceback.format_exc()
+    results.put((index, result, error, time.time() - start))
+
+
+def run_sweep(function, configs, parallel_runs=2, cores=None):
+    """
+    Runs function(config, threads) for every config in separate processes, at most parallel_runs at once,
+    each pinned to its own set of cores. Function has to be defined at module level and return dict.
+    Returns (config, result, error, seconds) in configs order.
+    """
+    # spawned workers start clean, without TensorFlow state or threads of parent process
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    free_cores = split_cores(cores or get_available_cores(), parallel_runs)
+    pending = list(range(len(configs)))
+    running = {}
+    outcomes = [None] * len(configs)
+
+    while pending or running:
+        while pending and free_cores:
+            index = pending.pop(0)
+            process_cores = free_cores.pop(0)
+            process = context.Process(target=run_config,
+                                      args=(function, index, configs[index], process_cores, results))
+            start_with_thread_limit(process, len(process_cores))
+            running[index] = (process, process_cores)
+            print("started config {} on cores {}: {}".format(index, process_cores, configs[index]))
+
+        try:
+            index, result, error, seconds = results.get(timeout=1.0)
+        except queue.Empty:
+            # worker killed without reporting (e.g. out of memory) still frees its cores
+            crashed = [index for index, (process, _) in running.items()
+                       if not process.is_alive() and process.exitcode != 0]
+            for index in crashed:
+                process, process_cores = running.pop(index)
+                outcomes[index] = (configs[index], {}, "exit code {}".format(process.exitcode), 0.0)
+                free_cores.append(process_cores)
+            continue
+
+        process, process_cores = running.pop(index)
+        process.join()
+        outcomes[index] = (configs[index], result, error, seconds)
+        free_cores.append(process_cores)
+        print("finished config {} in {:.0f} s{}".format(index, seconds, ", failed" if error else ""))
+        if error:
+            print(error, end="")
+
+    return outcomes
+
+
+def print_results(outcomes, result_keys):
+    """ Table of config values which differ between runs and given result values. """
+    config_keys = [key for key in sorted({key for config, _, _, _ in outcomes for key in config})
+                   if len({repr(config.get(key)) for config, _, _, _ in outcomes}) > 1]
+    rows = [[str(config.get(key)) for key in config_keys] +
+            ["error" if error else "{:.4g}".format(result[key]) if key in result else "-" for key in result_keys]
+            for config, result, error, _ in outcomes]
+
+    header = config_keys + result_keys
+    widths = [max([len(header[i])] + [len(row[i]) for row in rows]) + 2 for i in range(len(header))]
+    print("".join("{:>{}}".format(header[i], widths[i]) for i in range(len(header))))
+    for row in rows:
+        print("".join("{:>{}}".format(row[i], widths[i]) for i in range(len(row))))
@@ -0,0 +1,80 @@
+import argparse
+import cv2
+import numpy as np
+import os
+
+# Sticker colors (BGR): white, yellow, red, orange, blue, green
+COLORS = [(255, 255, 255), (0, 213, 255), (26, 26, 196), (0, 88, 255), (173, 70, 0), (72, 155, 0)]
+
+# Visible faces by label points (see RubikLoss.correct_label_orientation): top, left and right
+FACES = [(0, 3, 4, 5), (0, 1, 2, 3), (0, 5, 6, 1)]
+
+
+def get_cube_points(width, height, random_state):
+    """ 7 points of cube seen from its corner, placed randomly but fully inside image. """
+    size = random_state.uniform(0.2, 0.4) * min(width, height)
+    center = (random_state.uniform(size, width - size), random_state.uniform(size, height - size))
+    angle = random_state.uniform(-np.pi / 6, np.pi / 6)
+    squash = random_state.uniform(0.8, 1.0)
+
+    # center, then bottom and further clockwise around hexagon
+    angles = angle + np.pi / 2 + np.arange(6) * np.pi / 3
+    hexagon = np.stack([np.cos(angles) * size * squash, np.sin(angles) * size], axis=-1)
+    return np.concatenate([[center], center + hexagon]).astype(np.float32)
+
+
+def draw_cube(image, points, random_state):
+    for face in FACES:
+        origin = points[face[0]]
+        u = points[face[1]] - origin
+        v = points[face[3]] - origin
+        for i in range(3):
+            for j in range(3):
+                corners = [origin + u * (i + di) / 3 + v * (j + dj) / 3 for di, dj in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+                color = COLORS[random_state.randint(len(COLORS))]
+                cv2.fillConvexPoly(image, np.round(np.array(corners) * 16).astype(np.int32), color,
+                                   lineType=cv2.LINE_AA, shift=4)
+                cv2.polylines(image, [np.round(np.array(corners) * 16).astype(np.int32)], True, (20, 20, 20),
+                              thickness=2, lineType=cv2.LINE_AA, shift=4)
+
+
+def generate_image(width, height, random_state):
+    image = random_state.randint(0, 256, (1, 1, 3)) + random_state.randint(-20, 21, (height, width, 3))
+    image = np.clip(image, 0, 255).astype(np.uint8)
+    points = get_cube_points(width, height, random_state)
+    draw_cube(image, points, random_state)
+    return image, points
+
+
+def generate_dataset(images_folder, labels_folder, count, width=640, height=480, seed=0,
+                     images_extension=".png", labels_extension=".bounds"):
+    """ Writes images with cube and their .bounds files in the same format as labeled dataset. """
+    os.makedirs(images_folder, exist_ok=True)
+    os.makedirs(labels_folder, exist_ok=True)
+    random_state = np.random.RandomState(seed)
+
+    for i in range(count):
+        image, points = generate_image(width, height, random_state)
+        name = "synthetic{:05d}".format(i)
+        cv2.imwrite(os.path.join(images_folder, name + images_extension), image)
+        with open(os.path.join(labels_folder, name + labels_extension), "w") as f:
+            f.write("\n".join("{:f},{:f}".format(x, y) for x, y in points) + "\n")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic labeled Rubik cube images")
+    parser.add_argument("images_folder")
+    parser.add_argument("--labels_folder", default=None, help="default is Bounds subfolder of images folder")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    labels_folder = args.labels_folder or os.path.join(args.images_folder, "Bounds")
+    generate_dataset(args.images_folder, labels_folder, args.count, args.width, args.height, args.seed)
+
+
+if __name__ == "__main__":
+    main()
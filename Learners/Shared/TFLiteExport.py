@@ -0,0 +1,156 @@
+import CubeMetrics
+from DataGenerator import DataGenerator
+from ModelCreator import ModelCreator
+import RubikLoss
+import argparse
+from keras.models import load_model
+import numpy as np
+import os
+import tempfile
+import tensorflow as tf
+import time
+
+
+def convert(graph_file, input_names, output_names, input_shape, calibration_images=None):
+    """
+    Converts frozen graph to TFLite. With calibration images weights and activations are quantized to int8,
+    activation ranges are taken from running graph on these images.
+    """
+    converter = tf.lite.TFLiteConverter.from_frozen_graph(graph_file, input_names, output_names,
+                                                          input_shapes={input_names[0]: input_shape})
+    if calibration_images is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.representative_dataset = lambda: ([image[np.newaxis]] for image in calibration_images)
+    return converter.convert()
+
+
+def run(model_content, images):
+    """ Predictions for images one by one (as on device) and median latency per image. """
+    interpreter = tf.lite.Interpreter(model_content=model_content)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+
+    predictions = []
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        interpreter.set_tensor(input_details["index"], quantize(image[np.newaxis], input_details))
+        interpreter.invoke()
+        predictions.append(dequantize(interpreter.get_tensor(output_details["index"])[0], output_details))
+        latencies.append(time.perf_counter() - start)
+
+    return np.array(predictions, dtype=np.float32), np.median(latencies) * 1000.0
+
+
+def quantize(values, details):
+    scale, zero_point = details["quantization"]
+    if details["dtype"] == np.float32 or scale == 0:
+        return values.astype(details["dtype"])
+    info = np.iinfo(details["dtype"])
+    return np.clip(np.round(values / scale + zero_point), info.min, info.max).astype(details["dtype"])
+
+
+def dequantize(values, details):
+    scale, zero_point = details["quantization"]
+    if details["dtype"] == np.float32 or scale == 0:
+        return values.astype(np.float32)
+    return (values.astype(np.float32) - zero_point) * scale
+
+
+def take_samples(generator, count):
+    images = []
+    labels = []
+    for idx in range(len(generator)):
+        batch_images, batch_labels = generator[idx]
+        images.append(np.array(batch_images, dtype=np.float32))
+        labels.append(np.array(batch_labels))
+        if sum(len(batch) for batch in images) >= count:
+            break
+    return np.concatenate(images)[:count], np.concatenate(labels)[:count]
+
+
+def export_int8(model, folder, name, calibration_generator, evaluation_generator,
+                calibration_samples=200, evaluation_samples=200, max_error_increase=1.0):
+    """
+    Saves float and full integer quantized TFLite models as name.tflite and name_int8.tflite.
+    Both are evaluated on labeled samples, ValueError is raised (and nothing is saved) when int8 mean
+    keypoint error is larger than float one by more than max_error_increase pixels.
+    """
+    image_height, image_width = calibration_generator.target_height, calibration_generator.target_width
+    calibration_images, _ = take_samples(calibration_generator, calibration_samples)
+    images, labels = take_samples(evaluation_generator, evaluation_samples)
+
+    input_names = [node.op.name for node in model.inputs]
+    graph_file = tempfile.NamedTemporaryFile(suffix=".pb", delete=False)
+    try:
+        graph_file.write(ModelCreator.freeze_inference_graph(model).SerializeToString())
+        graph_file.close()
+        input_shape = [1, image_height, image_width, 3]
+        float_content = convert(graph_file.name, input_names, ["output_1"], input_shape)
+        int8_content = convert(graph_file.name, input_names, ["output_1"], input_shape, calibration_images)
+    finally:
+        os.remove(graph_file.name)
+
+    results = {}
+    for variant, content in [("float", float_content), ("int8", int8_content)]:
+        predictions, latency = run(content, images)
+        results[variant] = {"size_mb": len(content) / 1024 ** 2,
+                            "latency_ms": latency,
+                            "cube_loss": CubeMetrics.cube_loss(labels, predictions).mean(),
+                            "cube_loss3": CubeMetrics.cube_loss3(labels, predictions).mean(),
+                            "point_error_px": CubeMetrics.point_errors(labels, predictions,
+                                                                       (image_width, image_height)).mean()}
+
+    print("{:<8}{:>10}{:>12}{:>12}{:>12}{:>16}".format("variant", "size_mb", "latency_ms", "cube_loss",
+                                                       "cube_loss3", "point_error_px"))
+    for variant, result in results.items():
+        print("{:<8}{:>10.1f}{:>12.2f}{:>12.5f}{:>12.5f}{:>16.3f}".format(
+            variant, result["size_mb"], result["latency_ms"], result["cube_loss"], result["cube_loss3"],
+            result["point_error_px"]))
+
+    error_increase = results["int8"]["point_error_px"] - results["float"]["point_error_px"]
+    if error_increase > max_error_increase:
+        raise ValueError("int8 model mean keypoint error is worse than float by {:.3f} px (allowed {} px)".format(
+            error_increase, max_error_increase))
+
+    for file_name_only, content in [(name + ".tflite", float_content), (name + "_int8.tflite", int8_content)]:
+        with open(os.path.join(folder, file_name_only), "wb") as f:
+            f.write(content)
+        print("saved TFLite model at: ", os.path.join(folder, file_name_only))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Keras model to float and calibrated int8 TFLite models")
+    parser.add_argument("model_file")
+    parser.add_argument("images_folder")
+    parser.add_argument("labels_folder")
+    parser.add_argument("--calibration_samples", type=int, default=200)
+    parser.add_argument("--evaluation_samples", type=int, default=200)
+    parser.add_argument("--max_error_increase", type=float, default=1.0, help="pixels of mean keypoint error")
+    parser.add_argument("--width", type=int, default=299)
+    parser.add_argument("--height", type=int, default=299)
+    args = parser.parse_args()
+
+    RubikLoss.register_losses()
+    model = load_model(args.model_file)
+
+    generator = DataGenerator.init_from_folder(args.images_folder, args.labels_folder, batch_size=32,
+                                               augment_data=False, target_width=args.width,
+                                               target_height=args.height,
+                                               label_flip_pairs=RubikLoss.get_horizontal_flip_pairs(),
+                                               label_extra_normalization=RubikLoss.correct_label_orientation,
+                                               seed=0, use_manifest=True)
+    evaluation_generator = generator.get_validation_data()  # held out from calibration samples
+
+    folder, file_name = os.path.split(args.model_file)
+    export_int8(model, folder, os.path.splitext(file_name)[0], generator, evaluation_generator,
+                calibration_samples=args.calibration_samples, evaluation_samples=args.evaluation_samples,
+                max_error_increase=args.max_error_increase)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
-import matplotlib.pyplot as plt
 import cv2
 
 
 def show_history(history, title):
+    import matplotlib.pyplot as plt  # only when something is shown, matplotlib is slow to import
+
     plt.plot(history.history["mean_absolute_error"][1:])
     plt.title(title)
     plt.ylabel("mean absolute error")
@@ -32,6 +33,8 @@ def show_image(img, lbl, title=None):
 
     img = img[..., ::-1]
 
+    import matplotlib.pyplot as plt
+
     plt.imshow(img)
     if title:
         plt.title(title)